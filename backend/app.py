@@ -1,13 +1,280 @@
 # Backend API for the YouTube Captions Extension
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from flask import Flask, request, jsonify
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from flask import Flask, Response, g, request, jsonify
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
-from youtube_transcript_api import YouTubeTranscriptApi, TranscriptsDisabled, NoTranscriptFound
+from youtube_transcript_api import TranscriptsDisabled, NoTranscriptFound
+from export_formatters import EXPORT_FORMATS
+from export_jobs import ARCHIVE_TYPES, ExportJobManager
+from metrics import registry, request_seconds, stage
+from offline_translation import MODEL_TAG, model_language, translate_captions, translated_from_tag
+from profiling import RequestProfiler
+from test_highlighting import highlight_segments
+from transcript_cache import TranscriptListCache
+from transcript_index import TranscriptIndex, estimate_index_size
+from transcript_sources import source_from_env
+from transcript_store import TranscriptStore
+from translation_cache import shared_translation_cache
+from translator_registry import translator_registry
+from upstream import UpstreamBusy, upstream
+import hmac
+import json
+import logging
+import os
 import re
+import threading
+import time
+
+# LOG_LEVEL=DEBUG shows per-request details; messages are 'event key=value ...'
+logging.basicConfig(
+    level=os.environ.get('LOG_LEVEL', 'INFO').upper(),
+    format='%(asctime)s %(levelname)s %(name)s %(message)s',
+)
+logger = logging.getLogger('captioncraft')
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider, with serialization time recorded as its own stage"""
+
+    def dumps(self, obj, **kwargs):
+        with stage('json_serialize'):
+            return super().dumps(obj, **kwargs)
 
 app = Flask(__name__)
+app.json = TimedJSONProvider(app)
 CORS(app)  # Enable CORS for all routes
 
+# Admin endpoints need X-Admin-Token: ADMIN_TOKEN; without a token they only answer localhost
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+request_profiler = RequestProfiler(max_reports=int(os.environ.get('PROFILE_MAX_REPORTS', 20)))
+
+# YouTube, or TRANSCRIPT_SOURCE=fake for synthetic transcripts with no network access (load tests)
+transcript_source = source_from_env()
+
+def list_transcripts_upstream(video_id):
+    """List a video's transcripts upstream, through the shared upstream limiter"""
+    with stage('upstream_list'):
+        return upstream.call(transcript_source.list_transcripts, video_id)
+
+# Shared across requests so one page load lists each video only once
+transcript_list_cache = TranscriptListCache(
+    list_transcripts_upstream,
+    ttl=float(os.environ.get('TRANSCRIPT_LIST_TTL', 300)),
+    max_entries=int(os.environ.get('TRANSCRIPT_LIST_MAX_ENTRIES', 1024)),
+    max_bytes=int(os.environ.get('TRANSCRIPT_LIST_MAX_BYTES', 32 * 1024 * 1024)),
+)
+
+# Fetched and translated transcripts survive restarts in a local SQLite store
+transcript_store = TranscriptStore(
+    os.environ.get('TRANSCRIPT_STORE_PATH', os.path.join(os.path.dirname(__file__), 'transcripts.sqlite3')),
+    max_bytes=int(os.environ.get('TRANSCRIPT_STORE_MAX_BYTES', 512 * 1024 * 1024)),
+)
+
+def load_transcript_index(key):
+    """Index a stored transcript; LookupError if it was evicted since its digest was read"""
+    video_id, lang, digest, translator = key
+    transcript_data = transcript_store.find(video_id, lang, translator=translator)
+    if transcript_data is None:
+        raise LookupError(f'{video_id}/{lang} is no longer stored')
+    return TranscriptIndex(transcript_data)
+
+# Start-time indexes of recently paged transcripts, keyed by content digest so updates never go stale
+transcript_index_cache = TranscriptListCache(
+    load_transcript_index,
+    ttl=float(os.environ.get('TRANSCRIPT_INDEX_TTL', 3600)),
+    max_entries=int(os.environ.get('TRANSCRIPT_INDEX_MAX_ENTRIES', 256)),
+    max_bytes=int(os.environ.get('TRANSCRIPT_INDEX_MAX_BYTES', 64 * 1024 * 1024)),
+    sizeof=estimate_index_size,
+)
+
+# How missing languages are produced: 'upstream' (YouTube's machine translation),
+# 'local' (the SMaLL-100 model, no upstream calls) or 'fallback' (upstream, then local)
+TRANSLATION_MODES = ('upstream', 'local', 'fallback')
+TRANSLATION_MODE = os.environ.get('TRANSLATION_MODE', 'upstream')
+if TRANSLATION_MODE not in TRANSLATION_MODES:
+    raise ValueError(f'TRANSLATION_MODE must be one of {TRANSLATION_MODES}, not {TRANSLATION_MODE!r}')
+
+# Local translations in progress, keyed by (source digest, target language); concurrent requests wait for the first
+local_translations = {}
+local_translations_lock = threading.Lock()
+
+# One bounded pool for multi-language fetches instead of a new executor per request
+fanout_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('FANOUT_MAX_WORKERS', 16)),
+    thread_name_prefix='fanout',
+)
+
+def get_transcript_list(video_id):
+    """Return the (cached) transcript listing for a video"""
+    return transcript_list_cache.get(video_id)
+
+def fetch_and_store(video_id, transcript, translated_from=None):
+    """Fetch a transcript upstream and keep a copy in the transcript store"""
+    with stage('upstream_fetch'):
+        transcript_data = upstream.call(transcript.fetch)
+    transcript_store.put(video_id, transcript.language_code, transcript.is_generated,
+                         translated_from, transcript_data)
+    return transcript_data
+
+def stored_translator(translation_mode=None):
+    """Whose stored translations a mode may serve: '' (YouTube), the local model's tag, or None (both)"""
+    return {'upstream': '', 'local': MODEL_TAG}.get(translation_mode or TRANSLATION_MODE)
+
+def load_transcript(video_id, lang, translation_mode=None):
+    """Return a transcript from the store, fetching (or translating) it if needed"""
+    transcript_data = transcript_store.find(video_id, lang, translator=stored_translator(translation_mode))
+    if transcript_data is None:
+        transcript_data = fetch_single_transcript(get_transcript_list(video_id), lang, translation_mode)
+    return transcript_data
+
+def get_transcript_index(video_id, lang, translation_mode=None):
+    """Return the start-time index of a transcript, fetching the transcript first if needed"""
+    translator = stored_translator(translation_mode)
+    digest = transcript_store.digest(video_id, lang, translator=translator)
+    if digest is None:
+        transcript_data = load_transcript(video_id, lang, translation_mode)
+        digest = transcript_store.digest(video_id, lang, translator=translator)
+        if digest is None:
+            return TranscriptIndex(transcript_data)
+    try:
+        return transcript_index_cache.get((video_id, lang, digest, translator))
+    except LookupError:
+        # Evicted since the digest lookup: a miss like any other
+        return TranscriptIndex(load_transcript(video_id, lang, translation_mode))
+
+def parse_window_args(args):
+    """Read the optional from/to/cursor/limit paging arguments; None if the request is not windowed"""
+    names = ('from', 'to', 'cursor', 'limit')
+    if not any(args.get(name) is not None for name in names):
+        return None
+    start_time = args.get('from', type=float)
+    end_time = args.get('to', type=float)
+    cursor = args.get('cursor', type=int)
+    limit = args.get('limit', type=int)
+    for name, value in zip(names, (start_time, end_time, cursor, limit)):
+        if args.get(name) is not None and value is None:
+            raise ValueError(f'Invalid value for {name}: {args.get(name)}')
+    if (cursor is not None and cursor < 0) or (limit is not None and limit <= 0):
+        raise ValueError('cursor must be >= 0 and limit must be > 0')
+    return start_time, end_time, cursor, limit
+
+def upstream_busy_response(error):
+    """503 telling the client to back off while the upstream pool is saturated"""
+    response = jsonify({'error': str(error)})
+    response.status_code = 503
+    response.headers.set('Retry-After', str(error.retry_after))
+    return response
+
+def segments_response(fields, segments):
+    """A JSON response of fields plus 'transcript', with the CompactTranscript serialized straight from its columns"""
+    with stage('json_serialize'):
+        # The untimed parent dumps, so the whole response is one json_serialize observation
+        envelope = DefaultJSONProvider.dumps(app.json, fields, separators=(',', ':'))
+        body = envelope[:-1] + ',"transcript":' + segments.to_json() + '}\n'
+    return app.response_class(body, mimetype=app.json.mimetype)
+
+def first_transcript(transcript_list):
+    """Return the first available transcript (TranscriptList does not support indexing)"""
+    return next(iter(transcript_list))
+
+def get_translation_mode(value):
+    """Validate a per-request translation mode, defaulting to TRANSLATION_MODE"""
+    mode = value or TRANSLATION_MODE
+    if mode not in TRANSLATION_MODES:
+        raise ValueError(f"translation must be one of: {', '.join(TRANSLATION_MODES)}")
+    return mode
+
+def translate_locally(transcript_list, reference_transcript, lang):
+    """Translate a whole transcript with the local model and store it; None if the model lacks either language"""
+    video_id = transcript_list.video_id
+    src_lang = model_language(reference_transcript.language_code)
+    tgt_lang = model_language(lang)
+    if src_lang is None or tgt_lang is None:
+        return None
+
+    source_data = transcript_store.find(video_id, reference_transcript.language_code)
+    if source_data is None:
+        source_data = fetch_and_store(video_id, reference_transcript)
+    source_digest = transcript_store.digest(video_id, reference_transcript.language_code)
+    key = (source_digest or f'{video_id}/{reference_transcript.language_code}', lang)
+
+    with local_translations_lock:
+        pending = local_translations.get(key)
+        owner = pending is None
+        if owner:
+            pending = local_translations[key] = Future()
+    if not owner:
+        logger.debug("translate.local_coalesced video_id=%s target=%s", video_id, lang)
+        return pending.result()
+
+    try:
+        # A request that finished just before this one took ownership may have stored it already
+        transcript_data = transcript_store.find(video_id, lang, translated_from_tag(reference_transcript.language_code))
+        if transcript_data is None:
+            logger.info("translate.local video_id=%s source=%s target=%s",
+                        video_id, reference_transcript.language_code, lang)
+            with stage('local_translation'):
+                transcript_data = translate_captions(source_data, src_lang, tgt_lang, translator_registry.get())
+            transcript_store.put(video_id, lang, True, translated_from_tag(reference_transcript.language_code),
+                                 transcript_data)
+    except BaseException as e:
+        pending.set_exception(e)
+        raise
+    else:
+        pending.set_result(transcript_data)
+        return transcript_data
+    finally:
+        with local_translations_lock:
+            local_translations.pop(key, None)
+
+def translate_missing(transcript_list, lang, translation_mode=None):
+    """Produce a transcript in a language the video does not have; None if no translation route is available"""
+    translation_mode = translation_mode or TRANSLATION_MODE
+    reference_transcript = first_transcript(transcript_list)
+    if translation_mode == 'local':
+        return translate_locally(transcript_list, reference_transcript, lang)
+
+    if reference_transcript.is_translatable:
+        try:
+            return fetch_and_store(transcript_list.video_id, reference_transcript.translate(lang),
+                                   reference_transcript.language_code)
+        except Exception as e:
+            if translation_mode != 'fallback':
+                raise
+            logger.warning("translate.upstream_failed video_id=%s target=%s error=%r, translating locally",
+                           transcript_list.video_id, lang, str(e))
+    if translation_mode == 'fallback':
+        return translate_locally(transcript_list, reference_transcript, lang)
+    return None
+
+@app.before_request
+def start_request_timing():
+    """Start the endpoint timer, and a profile if the admin switch asked for one"""
+    g.request_started = time.perf_counter()
+    if not request.path.startswith(('/api/admin/', '/metrics')):
+        g.profile_session = request_profiler.start(request.path)
+
+@app.after_request
+def record_request_metrics(response):
+    """Record endpoint latency; streamed bodies are timed until the first byte"""
+    endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    request_seconds.observe(time.perf_counter() - g.request_started,
+                            endpoint=endpoint, method=request.method, status=response.status_code)
+    g.response_status = response.status_code
+    return response
+
+@app.teardown_request
+def finish_request_profile(error=None):
+    """Stop a running profile even if the request failed"""
+    session = g.pop('profile_session', None)
+    if session is not None:
+        request_profiler.finish(session, request.method, request.path, g.get('response_status', 500))
+
+def admin_allowed():
+    """Whether the current request may use the admin endpoints"""
+    if ADMIN_TOKEN:
+        return hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN)
+    return request.remote_addr in ('127.0.0.1', '::1')
+
 @app.route('/api/list-transcripts', methods=['GET'])
 def list_transcripts():
     """
@@ -19,13 +286,12 @@ def list_transcripts():
         return jsonify({'error': 'No video ID provided'}), 400
     
     try:
-        print(f"Attempting to fetch transcripts for video ID: {video_id}")
-        transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
+        logger.debug("transcripts.list video_id=%s", video_id)
+        transcript_list = get_transcript_list(video_id)
         
         # Convert transcript list to a serializable format
         transcripts = []
         for transcript in transcript_list:
-            print(f"Found transcript: {transcript.language_code} - {transcript.language}")
             transcripts.append({
                 'language': transcript.language,
                 'language_code': transcript.language_code,
@@ -41,17 +307,19 @@ def list_transcripts():
             'video_id': video_id,
             'transcripts': transcripts
         }
-        print(f"Returning response with {len(transcripts)} transcripts")
+        logger.debug("transcripts.list video_id=%s count=%d", video_id, len(transcripts))
         return jsonify(response_data)
         
     except TranscriptsDisabled:
-        print(f"Transcripts are disabled for video {video_id}")
+        logger.info("transcripts.disabled video_id=%s", video_id)
         return jsonify({'error': 'Transcripts are disabled for this video'}), 404
     except NoTranscriptFound:
-        print(f"No transcript found for video {video_id}")
+        logger.info("transcripts.not_found video_id=%s", video_id)
         return jsonify({'error': 'No transcript found for this video'}), 404
+    except UpstreamBusy as e:
+        return upstream_busy_response(e)
     except Exception as e:
-        print(f"Error fetching transcripts: {str(e)}")
+        logger.exception("transcripts.list_failed video_id=%s", video_id)
         return jsonify({'error': f'Error fetching transcripts: {str(e)}'}), 500
 
 @app.route('/api/get-transcript', methods=['GET'])
@@ -67,30 +335,56 @@ def get_transcript():
     
     if not lang:
         return jsonify({'error': 'No language code provided'}), 400
+
+    try:
+        window = parse_window_args(request.args)
+        translation_mode = get_translation_mode(request.args.get('translation'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     try:
-        print(f"Fetching transcript for video {video_id} in language {lang}")
+        logger.debug("transcript.get video_id=%s lang=%s", video_id, lang)
+        if window is not None:
+            # Only the captions in [from, to) (optionally paged by cursor/limit), found by bisecting start times
+            index = get_transcript_index(video_id, lang, translation_mode)
+            start_time, end_time, cursor, limit = window
+            start_index, segments, next_cursor = index.page(start_time, end_time, cursor, limit)
+            return segments_response({
+                'video_id': video_id,
+                'language': lang,
+                'start_index': start_index,
+                'next_cursor': next_cursor,
+                'total_segments': len(index)
+            }, segments)
+
+        transcript_data = transcript_store.find(video_id, lang, translator=stored_translator(translation_mode))
+        if transcript_data is not None:
+            return jsonify({
+                'video_id': video_id,
+                'language': lang,
+                'transcript': transcript_data
+            })
+
         # Get transcript in the specified language
-        transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
+        transcript_list = get_transcript_list(video_id)
         
         try:
             # Try to find transcript in the requested language
             transcript = transcript_list.find_transcript([lang])
-            transcript_data = transcript.fetch()
-            print(f"Found direct transcript in {lang}")
+            transcript_data = fetch_and_store(video_id, transcript)
+            logger.debug("transcript.fetched video_id=%s lang=%s", video_id, lang)
         except NoTranscriptFound:
             # If not found, try to translate from another language if possible
             try:
-                reference_transcript = transcript_list[0]  # Get the first available transcript
-                if reference_transcript.is_translatable:
-                    print(f"Translating transcript to {lang} from {reference_transcript.language_code}")
-                    transcript = reference_transcript.translate(lang)
-                    transcript_data = transcript.fetch()
-                else:
-                    print(f"No transcript in {lang} and translation is not available")
+                logger.debug("transcript.translate video_id=%s lang=%s mode=%s", video_id, lang, translation_mode)
+                transcript_data = translate_missing(transcript_list, lang, translation_mode)
+                if transcript_data is None:
+                    logger.info("transcript.not_translatable video_id=%s lang=%s", video_id, lang)
                     return jsonify({'error': f'No transcript found in {lang} and translation is not available'}), 404
+            except UpstreamBusy:
+                raise
             except Exception as e:
-                print(f"Error translating transcript: {str(e)}")
+                logger.exception("transcript.translate_failed video_id=%s lang=%s", video_id, lang)
                 return jsonify({'error': f'Error translating transcript: {str(e)}'}), 500
         
         # Process fetched transcript
@@ -101,13 +395,15 @@ def get_transcript():
         })
         
     except TranscriptsDisabled:
-        print(f"Transcripts are disabled for video {video_id}")
+        logger.info("transcripts.disabled video_id=%s", video_id)
         return jsonify({'error': 'Transcripts are disabled for this video'}), 404
     except NoTranscriptFound:
-        print(f"No transcript found for video {video_id} in language: {lang}")
+        logger.info("transcript.not_found video_id=%s lang=%s", video_id, lang)
         return jsonify({'error': f'No transcript found for video in language: {lang}'}), 404
+    except UpstreamBusy as e:
+        return upstream_busy_response(e)
     except Exception as e:
-        print(f"Error fetching transcript: {str(e)}")
+        logger.exception("transcript.get_failed video_id=%s lang=%s", video_id, lang)
         return jsonify({'error': f'Error fetching transcript: {str(e)}'}), 500
 
 @app.route('/api/translate-transcript', methods=['GET'])
@@ -121,10 +417,28 @@ def translate_transcript():
     
     if not video_id or not source_lang or not target_lang:
         return jsonify({'error': 'Missing required parameters: videoId, sourceLang, targetLang'}), 400
+    try:
+        translation_mode = get_translation_mode(request.args.get('translation'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     try:
+        transcript_data = None
+        if translation_mode != 'local':
+            transcript_data = transcript_store.find(video_id, target_lang, translated_from=source_lang)
+        if transcript_data is None and translation_mode != 'upstream':
+            transcript_data = transcript_store.find(video_id, target_lang,
+                                                    translated_from=translated_from_tag(source_lang))
+        if transcript_data is not None:
+            return jsonify({
+                'video_id': video_id,
+                'source_language': source_lang,
+                'target_language': target_lang,
+                'transcript': transcript_data
+            })
+
         # Get transcript list
-        transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
+        transcript_list = get_transcript_list(video_id)
         
         # Get source transcript
         try:
@@ -132,23 +446,24 @@ def translate_transcript():
         except NoTranscriptFound:
             return jsonify({'error': f'No transcript found in source language: {source_lang}'}), 404
         
-        # Check if the transcript can be translated
-        if not source_transcript.is_translatable:
+        # Check if the transcript can be translated upstream
+        target_lang_available = source_transcript.is_translatable and any(
+            lang['language_code'] == target_lang for lang in source_transcript.translation_languages
+        )
+
+        if translation_mode == 'local' or (translation_mode == 'fallback' and not target_lang_available):
+            # Translate the whole transcript with the local model
+            transcript_data = translate_locally(transcript_list, source_transcript, target_lang)
+            if transcript_data is None:
+                return jsonify({'error': f'Local translation from {source_lang} to {target_lang} is not supported'}), 400
+        elif not source_transcript.is_translatable:
             return jsonify({'error': 'This transcript cannot be translated'}), 400
-        
-        # Check if target language is available for translation
-        target_lang_available = False
-        for lang in source_transcript.translation_languages:
-            if lang['language_code'] == target_lang:
-                target_lang_available = True
-                break
-        
-        if not target_lang_available:
+        elif not target_lang_available:
             return jsonify({'error': f'Target language {target_lang} is not available for translation'}), 400
-        
-        # Translate the transcript
-        translated_transcript = source_transcript.translate(target_lang)
-        transcript_data = translated_transcript.fetch()
+        else:
+            # Translate the transcript
+            translated_transcript = source_transcript.translate(target_lang)
+            transcript_data = fetch_and_store(video_id, translated_transcript, source_lang)
         
         return jsonify({
             'video_id': video_id,
@@ -157,6 +472,8 @@ def translate_transcript():
             'transcript': transcript_data
         })
         
+    except UpstreamBusy as e:
+        return upstream_busy_response(e)
     except Exception as e:
         return jsonify({'error': f'Error translating transcript: {str(e)}'}), 500
 
@@ -172,45 +489,39 @@ def export_transcript():
     if not video_id or not lang:
         return jsonify({'error': 'Missing required parameters: videoId, lang'}), 400
     
+    exporter = EXPORT_FORMATS.get(format_type.lower())
+    if exporter is None:
+        return jsonify({'error': f'Unsupported format: {format_type}'}), 400
+    formatter, mimetype, extension = exporter
+    filename = f"{video_id}_{lang}.{extension}"
+
     try:
-        # Get transcript
-        transcript_data = YouTubeTranscriptApi.get_transcript(video_id, languages=[lang])
-        
-        # Format based on requested type
-        if format_type.lower() == 'txt':
-            from youtube_transcript_api.formatters import TextFormatter
-            formatter = TextFormatter()
-            formatted_transcript = formatter.format_transcript(transcript_data)
-            mimetype = 'text/plain'
-            filename = f"{video_id}_{lang}.txt"
-        elif format_type.lower() == 'json':
-            import json
-            formatted_transcript = json.dumps(transcript_data, indent=2)
-            mimetype = 'application/json'
-            filename = f"{video_id}_{lang}.json"
-        elif format_type.lower() == 'srt':
-            from youtube_transcript_api.formatters import SRTFormatter
-            formatter = SRTFormatter()
-            formatted_transcript = formatter.format_transcript(transcript_data)
-            mimetype = 'text/plain'
-            filename = f"{video_id}_{lang}.srt"
-        elif format_type.lower() == 'vtt':
-            from youtube_transcript_api.formatters import WebVTTFormatter
-            formatter = WebVTTFormatter()
-            formatted_transcript = formatter.format_transcript(transcript_data)
-            mimetype = 'text/plain'
-            filename = f"{video_id}_{lang}.vtt"
-        else:
-            return jsonify({'error': f'Unsupported format: {format_type}'}), 400
-        
+        # Repeated downloads of an unchanged transcript cost a 304 and no decoding at all
+        digest = transcript_store.digest(video_id, lang, translator=stored_translator())
+        if digest is not None and request.if_none_match.contains(f"{digest}-{extension}"):
+            response = app.response_class(status=304)
+            response.set_etag(f"{digest}-{extension}")
+            return response
+
+        # Same store/cache path as get-transcript
+        transcript_data = load_transcript(video_id, lang)
+        digest = transcript_store.digest(video_id, lang, translator=stored_translator())
+
+        # Stream the formatted file chunk by chunk instead of building it in memory
         response = app.response_class(
-            response=formatted_transcript,
+            response=formatter(transcript_data),
             status=200,
             mimetype=mimetype
         )
+        if digest is not None:
+            response.set_etag(f"{digest}-{extension}")
         response.headers.set('Content-Disposition', f'attachment; filename={filename}')
         return response
         
+    except (TranscriptsDisabled, NoTranscriptFound):
+        return jsonify({'error': f'No transcript found for video in language: {lang}'}), 404
+    except UpstreamBusy as e:
+        return upstream_busy_response(e)
     except Exception as e:
         return jsonify({'error': f'Error exporting transcript: {str(e)}'}), 500
     
@@ -225,23 +536,35 @@ def get_multiple_transcripts():
     
     if not video_id or not languages:
         return jsonify({'error': 'Missing videoId or languages'}), 400
+    try:
+        translation_mode = get_translation_mode(data.get('translation'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
     try:
-        transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
-        results = {}
+        # Serve whatever is already stored, and only go upstream for the rest
+        results = transcript_store.find_many(video_id, languages, translator=stored_translator(translation_mode))
         errors = {}
+        missing = [lang for lang in languages if lang not in results]
+        if not missing:
+            return jsonify({
+                'video_id': video_id,
+                'transcripts': results,
+                'errors': errors
+            }), 200
 
-        with ThreadPoolExecutor() as executor:
-            futures = {}
-            for lang in languages:
-                futures[executor.submit(fetch_single_transcript, transcript_list, lang)] = lang
+        transcript_list = get_transcript_list(video_id)
 
-            for future in as_completed(futures):
-                lang = futures[future]
-                try:
-                    results[lang] = future.result()
-                except Exception as e:
-                    errors[lang] = str(e)
+        futures = {}
+        for lang in missing:
+            futures[fanout_executor.submit(fetch_single_transcript, transcript_list, lang, translation_mode)] = lang
+
+        for future in as_completed(futures):
+            lang = futures[future]
+            try:
+                results[lang] = future.result()
+            except Exception as e:
+                errors[lang] = str(e)
 
         return jsonify({
             'video_id': video_id,
@@ -249,20 +572,327 @@ def get_multiple_transcripts():
             'errors': errors
         }), 200 if results else 500
 
+    except UpstreamBusy as e:
+        return upstream_busy_response(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def stream_event(payload, stream_format):
+    """Encode one streamed message as an NDJSON line or a server-sent event"""
+    data = json.dumps(payload, ensure_ascii=False, separators=(',', ':'))
+    if stream_format == 'sse':
+        return f"event: {'done' if payload.get('done') else 'transcript'}\ndata: {data}\n\n"
+    return data + '\n'
+
+@app.route('/api/stream-transcripts', methods=['POST'])
+def stream_transcripts():
+    """
+    Streaming variant of get-multiple-transcripts: every language is sent as soon as it is ready,
+    as newline-delimited JSON (default) or server-sent events (?format=sse)
+    """
+    data = request.json or {}
+    video_id = data.get('videoId')
+    languages = list(dict.fromkeys(data.get('languages', [])))
+    stream_format = request.args.get('format', data.get('format', 'ndjson')).lower()
+
+    if not video_id or not languages:
+        return jsonify({'error': 'Missing videoId or languages'}), 400
+    if stream_format not in ('ndjson', 'sse'):
+        return jsonify({'error': f'Unsupported stream format: {stream_format}'}), 400
+    try:
+        translation_mode = get_translation_mode(data.get('translation'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        # Languages are served in request order, so the client lists its primary language first
+        translator = stored_translator(translation_mode)
+        stored = [lang for lang in languages
+                  if transcript_store.digest(video_id, lang, translator=translator) is not None]
+        missing = [lang for lang in languages if lang not in stored]
+        futures = {}
+        if missing:
+            # Listing errors still get a proper status code before the stream starts
+            transcript_list = get_transcript_list(video_id)
+            for lang in missing:
+                futures[fanout_executor.submit(fetch_single_transcript, transcript_list, lang, translation_mode)] = lang
+    except (TranscriptsDisabled, NoTranscriptFound):
+        return jsonify({'error': 'No transcript found for this video'}), 404
+    except UpstreamBusy as e:
+        return upstream_busy_response(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-def fetch_single_transcript(transcript_list, lang):
+    def generate():
+        errors = {}
+        try:
+            # One transcript in memory at a time: decode, send, drop
+            for lang in stored:
+                transcript_data = transcript_store.find(video_id, lang, translator=translator)
+                if transcript_data is None:
+                    # Evicted since the digest lookup
+                    futures[fanout_executor.submit(load_transcript, video_id, lang, translation_mode)] = lang
+                    continue
+                yield stream_event({'lang': lang, 'transcript': transcript_data}, stream_format)
+
+            for future in as_completed(list(futures)):
+                lang = futures.pop(future)
+                try:
+                    message = {'lang': lang, 'transcript': future.result()}
+                except Exception as e:
+                    errors[lang] = str(e)
+                    message = {'lang': lang, 'error': str(e)}
+                yield stream_event(message, stream_format)
+
+            yield stream_event({'done': True, 'video_id': video_id, 'errors': errors}, stream_format)
+        finally:
+            # Client went away: do not keep fetching languages nobody will read
+            for future in futures:
+                future.cancel()
+
+    mimetype = 'text/event-stream' if stream_format == 'sse' else 'application/x-ndjson'
+    response = Response(generate(), mimetype=mimetype)
+    response.headers.set('Cache-Control', 'no-cache')
+    response.headers.set('X-Accel-Buffering', 'no')
+    return response
+
+@app.route('/api/export-jobs', methods=['POST'])
+def create_export_job():
+    """
+    Start a bulk export of videoIds x languages; formats are rendered into one archive on download
+    """
+    data = request.json or {}
+    try:
+        job = export_jobs.create(
+            data.get('videoIds', []),
+            data.get('languages', []),
+            data.get('formats', ['txt']),
+            archive=data.get('archive', 'zip'),
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(job), 202
+
+@app.route('/api/export-jobs/<job_id>', methods=['GET'])
+def export_job_status(job_id):
+    """
+    Progress of a bulk export job
+    """
+    job = export_jobs.status(job_id)
+    if job is None:
+        return jsonify({'error': f'No export job {job_id}'}), 404
+    return jsonify(job)
+
+@app.route('/api/export-jobs/<job_id>/retry', methods=['POST'])
+def retry_export_job(job_id):
+    """
+    Run the failed items of a bulk export job again
+    """
+    job = export_jobs.retry_failed(job_id)
+    if job is None:
+        return jsonify({'error': f'No export job {job_id}'}), 404
+    return jsonify(job), 202
+
+@app.route('/api/export-jobs/<job_id>/archive', methods=['GET'])
+def export_job_archive(job_id):
+    """
+    Stream a finished bulk export job as a zip or tar.gz archive
+    """
+    job = export_jobs.status(job_id)
+    if job is None:
+        return jsonify({'error': f'No export job {job_id}'}), 404
+    if job['status'] != 'done':
+        return jsonify({'error': 'Export job is still running', 'progress': job['progress']}), 409
+
+    archive = request.args.get('archive', job['archive'])
+    if archive not in ARCHIVE_TYPES:
+        return jsonify({'error': f'Unsupported archive type: {archive}'}), 400
+
+    response = app.response_class(
+        response=export_jobs.iter_archive(job_id, archive),
+        status=200,
+        mimetype=ARCHIVE_TYPES[archive]
+    )
+    extension = 'zip' if archive == 'zip' else 'tar.gz'
+    response.headers.set('Content-Disposition', f'attachment; filename=captions_{job_id}.{extension}')
+    return response
+
+@app.route('/api/highlight', methods=['POST'])
+def highlight():
+    """
+    Endpoint returning keywords and match spans for every segment of a transcript in one response
+    """
+    data = request.json or {}
+    video_id = data.get('videoId')
+    source_lang = data.get('sourceLang')
+    target_langs = data.get('targetLangs', [])
+    
+    if not video_id or not source_lang:
+        return jsonify({'error': 'Missing required parameters: videoId, sourceLang'}), 400
+    if not isinstance(target_langs, list) or not all(isinstance(lang, str) for lang in target_langs):
+        return jsonify({'error': 'targetLangs must be a list of language codes'}), 400
+
+    try:
+        # Optional window of segment indices, end exclusive; clamped to the transcript once it is loaded
+        start_index = data.get('startIndex')
+        end_index = data.get('endIndex')
+        windowed = start_index is not None or end_index is not None
+        start_index = int(start_index or 0)
+        end_index = int(end_index) if end_index is not None else None
+    except (TypeError, ValueError):
+        return jsonify({'error': 'startIndex and endIndex must be integers'}), 400
+    if start_index < 0 or (end_index is not None and end_index < start_index):
+        return jsonify({'error': 'startIndex must be >= 0 and endIndex must be >= startIndex'}), 400
+
+    try:
+        source_data = load_transcript(video_id, source_lang)
+    except (TranscriptsDisabled, NoTranscriptFound):
+        return jsonify({'error': f'No transcript found for video in language: {source_lang}'}), 404
+    except UpstreamBusy as e:
+        return upstream_busy_response(e)
+    except Exception as e:
+        return jsonify({'error': f'Error fetching transcript: {str(e)}'}), 500
+
+    indices = None
+    if windowed:
+        end = len(source_data) if end_index is None else min(end_index, len(source_data))
+        indices = range(min(start_index, end), end)
+
+    target_data_by_lang = {}
+    errors = {}
+    for lang in target_langs:
+        if lang == source_lang:
+            continue
+        # Keywords are translated with the local model, which only knows some languages
+        if model_language(source_lang) is None or model_language(lang) is None:
+            errors[lang] = f'Keyword translation from {source_lang} to {lang} is not supported'
+            continue
+        try:
+            target_data_by_lang[lang] = load_transcript(video_id, lang)
+        except Exception as e:
+            errors[lang] = str(e)
+
+    try:
+        segments = highlight_segments(
+            source_data,
+            target_data_by_lang,
+            source_lang,
+            translator_registry.get(),
+            indices=indices,
+            document_level=data.get('documentLevel', True),
+        )
+    except Exception as e:
+        return jsonify({'error': f'Error highlighting transcript: {str(e)}'}), 500
+
+    return jsonify({
+        'video_id': video_id,
+        'source_language': source_lang,
+        'segments': segments,
+        'errors': errors
+    })
+
+@app.route('/api/cache-stats', methods=['GET'])
+def cache_stats():
+    """
+    Endpoint exposing hit/miss/coalesce counters of the transcript caches
+    """
+    return jsonify({
+        'transcript_lists': transcript_list_cache.stats(),
+        'transcript_indexes': transcript_index_cache.stats(),
+        'transcript_store': {'bytes': transcript_store.total_bytes, 'max_bytes': transcript_store.max_bytes},
+        'translations': shared_translation_cache().stats(),
+        'upstream': upstream.stats(),
+        'transcript_source': transcript_source.stats(),
+    })
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    """
+    Readiness of the translation model; transcript routes do not need it and serve right away
+    """
+    translator = translator_registry.status()
+    if not translator_registry.ready():
+        response = jsonify({'ready': False, 'translator': translator})
+        response.status_code = 503
+        response.headers.set('Retry-After', '5')
+        return response
+    return jsonify({'ready': True, 'translator': translator})
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Endpoint and per-stage latency histograms in the Prometheus text format
+    """
+    return Response(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/api/admin/profile', methods=['POST'])
+def start_profiling():
+    """
+    Profile the next N requests: {"requests": N, "mode": "cprofile"|"sampling", "path": prefix, "sort", "limit"}
+    """
+    if not admin_allowed():
+        return jsonify({'error': 'Forbidden'}), 403
+    data = request.json or {}
+    try:
+        count = int(data.get('requests', 1))
+        limit = int(data.get('limit', 50))
+        if not 0 <= count <= 1000 or limit <= 0:
+            raise ValueError('requests must be between 0 and 1000 and limit must be > 0')
+        status = request_profiler.arm(count, mode=data.get('mode', 'cprofile'), path_prefix=data.get('path', ''),
+                                      sort=data.get('sort', 'cumulative'), limit=limit)
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    logger.info("profile.armed requests=%d mode=%s path=%s", count, status['settings']['mode'],
+                status['settings']['path_prefix'])
+    return jsonify(status), 202
+
+@app.route('/api/admin/profile', methods=['GET'])
+def profiling_status():
+    """
+    Requests still to be profiled and the reports captured so far
+    """
+    if not admin_allowed():
+        return jsonify({'error': 'Forbidden'}), 403
+    return jsonify(request_profiler.status())
+
+@app.route('/api/admin/profile/<int:report_id>', methods=['GET'])
+def profile_report(report_id):
+    """
+    One captured profile: pstats output (cprofile) or collapsed stacks (sampling)
+    """
+    if not admin_allowed():
+        return jsonify({'error': 'Forbidden'}), 403
+    report = request_profiler.report(report_id)
+    if report is None:
+        return jsonify({'error': f'No profile report {report_id}'}), 404
+    return Response(report['report'], mimetype='text/plain; charset=utf-8')
+
+def fetch_single_transcript(transcript_list, lang, translation_mode=None):
     """Helper function to fetch a single transcript"""
+    video_id = transcript_list.video_id
     try:
         transcript = transcript_list.find_transcript([lang])
-        return transcript.fetch()
+        return fetch_and_store(video_id, transcript)
     except NoTranscriptFound:
         # Attempt translation fallback
-        reference_transcript = transcript_list[0]
-        if reference_transcript.is_translatable:
-            return reference_transcript.translate(lang).fetch()
-        raise
+        transcript_data = translate_missing(transcript_list, lang, translation_mode)
+        if transcript_data is None:
+            raise
+        return transcript_data
+
+# Created last: resumed jobs start fetching right away and need the helpers above
+export_jobs = ExportJobManager(
+    load_transcript,
+    os.environ.get('EXPORT_JOBS_DIR', os.path.join(os.path.dirname(__file__), 'export_jobs')),
+    max_workers=int(os.environ.get('EXPORT_MAX_WORKERS', 4)),
+    max_items=int(os.environ.get('EXPORT_JOB_MAX_ITEMS', 5000)),
+    # Seconds a finished job (and its transcripts) is kept for download
+    max_age=float(os.environ.get('EXPORT_JOB_TTL', 7 * 24 * 3600)),
+)
+
+# Load the model in the background so the first highlight request does not pay for it (TRANSLATOR_WARMUP=0 to skip)
+if os.environ.get('TRANSLATOR_WARMUP', '1') != '0':
+    translator_registry.warmup()
 
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,234 @@
+"""Asyncio serving mode for the transcript API
+
+Serves the same Flask routes from an asyncio event loop (e.g. under uvicorn):
+
+    uvicorn asgi:application --host 0.0.0.0 --port 5000
+
+Connections, slow clients and idle keep-alives cost no threads. Each request
+runs on a bounded worker pool; once max_pending requests are in flight, new ones
+get an immediate 503 instead of queueing, and every upstream call still goes
+through the shared UpstreamLimiter from upstream.py.
+"""
+import asyncio
+import io
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app import app
+
+_END = object()
+
+
+class _ClientGone(Exception):
+    """The client disconnected; the worker stops streaming."""
+
+
+class AsyncWSGIServer:
+    """ASGI application running a WSGI app on a bounded thread pool, with backpressure."""
+
+    def __init__(self, wsgi_app, max_workers=32, max_pending=256, stream_buffer=16):
+        self.wsgi_app = wsgi_app
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.stream_buffer = stream_buffer
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='request')
+        self.in_flight = 0
+        self.rejected = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._http(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False, cancel_futures=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _http(self, scope, receive, send):
+        if self.in_flight >= self.max_pending:
+            self.rejected += 1
+            await self._send_busy(send)
+            return
+
+        self.in_flight += 1
+        try:
+            body, disconnected = await self._read_body(receive)
+            if not disconnected:
+                await self._run(self._environ(scope, body), receive, send)
+        finally:
+            self.in_flight -= 1
+
+    async def _send_busy(self, send):
+        body = json.dumps({'error': 'Server is busy, please retry shortly'}).encode('utf-8')
+        await send({
+            'type': 'http.response.start',
+            'status': 503,
+            'headers': [(b'content-type', b'application/json'), (b'retry-after', b'1'),
+                        (b'content-length', str(len(body)).encode('latin-1'))],
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+    @staticmethod
+    async def _read_body(receive):
+        """The whole request body, and whether the client disconnected while sending it."""
+        chunks = []
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return b''.join(chunks), True
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body'):
+                return b''.join(chunks), False
+
+    @staticmethod
+    async def _watch_disconnect(receive, cancelled):
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                cancelled.set()
+                return
+
+    @staticmethod
+    def _environ(scope, body):
+        server_name, server_port = scope.get('server') or ('localhost', 80)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope['query_string'].decode('latin-1'),
+            'SERVER_NAME': server_name,
+            'SERVER_PORT': str(server_port),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        for name, value in scope['headers']:
+            name = name.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            if name == 'CONTENT_TYPE':
+                environ['CONTENT_TYPE'] = value
+            elif name == 'CONTENT_LENGTH':
+                continue
+            else:
+                key = f'HTTP_{name}'
+                environ[key] = f'{environ[key]},{value}' if key in environ else value
+        return environ
+
+    async def _run(self, environ, receive, send):
+        """Run the WSGI app in one worker thread and relay its chunks through a bounded queue."""
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(self.stream_buffer)
+        # Set when the client goes away: the worker stops producing and closes the app's iterable
+        cancelled = threading.Event()
+        space = threading.Event()
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers]
+
+        async def try_put(item):
+            if queue.full():
+                return False
+            queue.put_nowait(item)
+            return True
+
+        def put(item):
+            # Waits in the worker (not the loop) while the client is slower than the app,
+            # but never past a disconnect, so the worker cannot block forever on a full queue
+            while not cancelled.is_set():
+                space.clear()
+                try:
+                    if asyncio.run_coroutine_threadsafe(try_put(item), loop).result():
+                        return
+                except RuntimeError:
+                    # Event loop closed
+                    break
+                space.wait(0.05)
+            raise _ClientGone()
+
+        def worker():
+            try:
+                iterable = self.wsgi_app(environ, start_response)
+                try:
+                    for chunk in iterable:
+                        if chunk:
+                            put(chunk)
+                finally:
+                    # Always closed, so generators run their cleanup (e.g. cancelling upstream fetches)
+                    if hasattr(iterable, 'close'):
+                        iterable.close()
+                put(_END)
+            except _ClientGone:
+                pass
+            except BaseException as e:
+                try:
+                    put(e)
+                except _ClientGone:
+                    pass
+
+        future = loop.run_in_executor(self.executor, worker)
+        watcher = asyncio.ensure_future(self._watch_disconnect(receive, cancelled))
+        started = False
+        try:
+            while not cancelled.is_set():
+                getter = asyncio.ensure_future(queue.get())
+                await asyncio.wait({getter, watcher}, return_when=asyncio.FIRST_COMPLETED)
+                if not getter.done():
+                    getter.cancel()
+                    break
+                item = getter.result()
+                space.set()
+                if isinstance(item, BaseException):
+                    if started:
+                        raise item
+                    await send({'type': 'http.response.start', 'status': 500,
+                                'headers': [(b'content-type', b'text/plain')]})
+                    await send({'type': 'http.response.body', 'body': b'Internal Server Error'})
+                    break
+                if not started:
+                    await send({'type': 'http.response.start', 'status': response['status'],
+                                'headers': response['headers']})
+                    started = True
+                if item is _END:
+                    await send({'type': 'http.response.body', 'body': b''})
+                    break
+                await send({'type': 'http.response.body', 'body': item, 'more_body': True})
+        finally:
+            # Covers send() failing on a dropped connection as well as a normal finish
+            cancelled.set()
+            space.set()
+            watcher.cancel()
+            await future
+
+    def stats(self):
+        return {'in_flight': self.in_flight, 'rejected': self.rejected,
+                'max_workers': self.max_workers, 'max_pending': self.max_pending}
+
+
+application = AsyncWSGIServer(
+    app,
+    max_workers=int(os.environ.get('ASYNC_MAX_WORKERS', 32)),
+    max_pending=int(os.environ.get('ASYNC_MAX_PENDING', 256)),
+)
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(application, host='0.0.0.0', port=5000)
@@ -0,0 +1,262 @@
+"""
+Offline micro-benchmarks for the tokenizer, alignment and highlighting hot paths
+
+    python benchmark_suite.py run --output results.json
+    python benchmark_suite.py run --compare baseline.json --threshold 1.2
+    python benchmark_suite.py record VIDEO_ID en fr     # save a real transcript pair as a fixture
+
+Fixtures are transcript pairs ({'source': [...], 'target': [...]}) read from
+benchmark_fixtures/*.json. Without recorded fixtures, deterministic synthetic
+transcripts of several sizes are generated, so runs are repeatable with no
+network access. Tokenizer benchmarks need a local SMaLL-100 tokenizer
+(--tokenizer-dir, or the Hugging Face cache) and are skipped otherwise.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_fixtures')
+SYNTHETIC_SIZES = {'small': 100, 'medium': 1000, 'large': 4000}
+
+# find_matching_segment is quadratic; only this many source segments are matched per run
+FIND_MATCHING_LIMIT = 500
+
+_WORDS = (
+    "the of and to in is you that it he was for on are as with his they at be this have from or one had "
+    "by word but not what all were we when your can said there use each which she do how their if will up "
+    "other about out many then them these so some her would make like him into time has look two more write "
+    "go see number no way could people my than first water been call who oil its now find long down day did "
+    "get come made may part music science history ocean mountain engine language river computer garden"
+).split()
+_NAMES = ['Paris', 'Alice', 'Google', 'Amazon', 'Einstein', 'Tokyo']
+
+
+def synthetic_pair(size, seed=0):
+    """A deterministic source/target transcript pair; most targets are aligned within the 0.5s threshold."""
+    rng = random.Random(f'{seed}-{size}')
+    source, target = [], []
+    start = 0.0
+    for _ in range(size):
+        duration = round(rng.uniform(1.0, 6.0), 3)
+        words = rng.choices(_WORDS, k=rng.randint(4, 14))
+        if rng.random() < 0.2:
+            words.insert(rng.randrange(len(words)), rng.choice(_NAMES))
+        if rng.random() < 0.1:
+            words.append('(laughs)')
+        text = ' '.join(words)
+        source.append({'text': text, 'start': round(start, 3), 'duration': duration})
+
+        jitter = rng.uniform(-0.3, 0.3) if rng.random() < 0.85 else rng.uniform(0.6, 1.5)
+        target.append({'text': ' '.join(reversed(words)),
+                       'start': round(max(0.0, start + jitter), 3),
+                       'duration': round(max(0.5, duration + rng.uniform(-0.2, 0.2)), 3)})
+        start += duration * rng.uniform(0.6, 1.1)
+    return {'source': source, 'target': target, 'source_lang': 'en', 'target_lang': 'en'}
+
+
+def load_fixtures(directory, sizes):
+    """Recorded fixtures from directory, plus the synthetic ones for sizes."""
+    fixtures = {}
+    if os.path.isdir(directory):
+        for name in sorted(os.listdir(directory)):
+            if name.endswith('.json'):
+                with open(os.path.join(directory, name), encoding='utf-8') as f:
+                    fixtures[name[:-len('.json')]] = json.load(f)
+    for name in sizes:
+        fixtures[f'synthetic-{name}'] = synthetic_pair(SYNTHETIC_SIZES[name])
+    return fixtures
+
+
+def measure(fn, repeat):
+    """Run fn repeat times after one warmup; returns per-run wall times in seconds."""
+    fn()
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    return times
+
+
+def load_tokenizer(tokenizer_dir):
+    from tokenization_small100 import SMALL100Tokenizer
+    try:
+        if tokenizer_dir:
+            return SMALL100Tokenizer.from_pretrained(tokenizer_dir)
+        return SMALL100Tokenizer.from_pretrained('alirezamsh/small100', local_files_only=True)
+    except Exception as e:
+        print(f"Skipping tokenizer benchmarks: {str(e)}", file=sys.stderr)
+        return None
+
+
+def build_benchmarks(fixture, tokenizer=None):
+    """Return {name: (workload, ops)} for one fixture; ops is the number of items each run processes."""
+    from extract_keywords import extract_segment_keywords
+    from test_highlighting import (align_segments, clean_caption_text, extract_keywords,
+                                   find_matching_segment, highlight_text)
+
+    source = fixture['source']
+    target = fixture['target']
+    language = fixture.get('source_lang', 'en')
+    texts = [segment['text'] for segment in source]
+    cleaned = [clean_caption_text(text) for text in texts]
+    # Highlight a word that occurs in each text, like the real pipeline does
+    keywords = [next((w for w in text.split() if len(w) >= 3), text.split()[0] if text.split() else '')
+                for text in cleaned]
+    matching_sources = source[:FIND_MATCHING_LIMIT]
+
+    benchmarks = {
+        'clean_caption_text': (lambda: [clean_caption_text(text) for text in texts], len(texts)),
+        'highlight_text': (lambda: [highlight_text(text, keyword) for text, keyword in zip(texts, keywords)],
+                           len(texts)),
+        'extract_keywords': (lambda: [extract_keywords(text, language) for text in cleaned if text], len(texts)),
+        'extract_segment_keywords_document': (
+            lambda: extract_segment_keywords(cleaned, language, document_level=True), len(texts)),
+        'find_matching_segment': (lambda: [find_matching_segment(segment, target) for segment in matching_sources],
+                                  len(matching_sources)),
+        'align_segments': (lambda: align_segments(source, target), len(source)),
+    }
+
+    if tokenizer is not None:
+        tokenizer.tgt_lang = fixture.get('target_lang', 'fr')
+        ids = tokenizer.encode_many(texts)
+        benchmarks.update({
+            'tokenizer_call': (lambda: tokenizer(texts), len(texts)),
+            'tokenizer_encode_many': (lambda: tokenizer.encode_many(texts), len(texts)),
+            'tokenizer_batch_decode': (lambda: tokenizer.batch_decode(ids, skip_special_tokens=True), len(texts)),
+            'tokenizer_decode_many': (lambda: tokenizer.decode_many(ids, skip_special_tokens=True), len(texts)),
+        })
+    return benchmarks
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    fixtures = load_fixtures(args.fixtures, args.sizes.split(',') if args.sizes else [])
+    tokenizer = None if args.no_tokenizer else load_tokenizer(args.tokenizer_dir)
+    pattern = args.filter
+
+    results = {}
+    for fixture_name, fixture in fixtures.items():
+        for name, (workload, ops) in build_benchmarks(fixture, tokenizer).items():
+            if pattern and pattern not in name:
+                continue
+            times = measure(workload, args.repeat)
+            median = statistics.median(times)
+            results[f'{name}[{fixture_name}]'] = {
+                'benchmark': name,
+                'fixture': fixture_name,
+                'ops': ops,
+                'runs': len(times),
+                'median_ms': 1000 * median,
+                'min_ms': 1000 * min(times),
+                'max_ms': 1000 * max(times),
+                'us_per_op': 1e6 * median / ops if ops else 0.0,
+            }
+            print(f"{name + '[' + fixture_name + ']':<56}{1000 * median:>10.2f} ms"
+                  f"{1e6 * median / ops if ops else 0.0:>12.2f} us/op", file=sys.stderr)
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': time.time(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'repeat': args.repeat,
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        return compare(baseline, report, args.threshold)
+    return 0
+
+
+def compare(baseline, current, threshold):
+    """Print median ratios against a baseline report; returns 1 if any benchmark slowed down beyond threshold."""
+    regressions = 0
+    print(f"\nCompared with {baseline['meta'].get('commit')} (threshold {threshold:.2f}x)", file=sys.stderr)
+    for key, result in sorted(current['results'].items()):
+        before = baseline['results'].get(key)
+        if before is None or not before['median_ms']:
+            continue
+        ratio = result['median_ms'] / before['median_ms']
+        flag = ''
+        if ratio > threshold:
+            flag = '  REGRESSION'
+            regressions += 1
+        elif ratio < 1 / threshold:
+            flag = '  faster'
+        print(f"{key:<56}{before['median_ms']:>10.2f} -> {result['median_ms']:>10.2f} ms  {ratio:>5.2f}x{flag}",
+              file=sys.stderr)
+    return 1 if regressions else 0
+
+
+def record(args):
+    """Fetch a real transcript pair once and save it as a fixture."""
+    from youtube_transcript_api import YouTubeTranscriptApi
+    transcript_list = YouTubeTranscriptApi.list_transcripts(args.video_id)
+    fixture = {
+        'source': transcript_list.find_transcript([args.source_lang]).fetch(),
+        'target': transcript_list.find_transcript([args.target_lang]).fetch(),
+        'source_lang': args.source_lang,
+        'target_lang': args.target_lang,
+    }
+    os.makedirs(args.fixtures, exist_ok=True)
+    path = os.path.join(args.fixtures, f'{args.video_id}_{args.source_lang}_{args.target_lang}.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(fixture, f, ensure_ascii=False)
+    print(f"Saved {len(fixture['source'])}/{len(fixture['target'])} segments to {path}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline micro-benchmarks for the caption hot paths')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='run the benchmarks')
+    run_parser.add_argument('--fixtures', default=FIXTURES_DIR, help='directory of recorded fixtures')
+    run_parser.add_argument('--sizes', default=','.join(SYNTHETIC_SIZES),
+                            help='synthetic fixture sizes to include (empty for none)')
+    run_parser.add_argument('--repeat', type=int, default=5)
+    run_parser.add_argument('--filter', default=None, help='only run benchmarks whose name contains this')
+    run_parser.add_argument('--tokenizer-dir', default=None, help='local SMaLL-100 tokenizer directory')
+    run_parser.add_argument('--no-tokenizer', action='store_true')
+    run_parser.add_argument('--output', default=None, help='write the JSON report here instead of stdout')
+    run_parser.add_argument('--compare', default=None, help='baseline JSON report to compare against')
+    run_parser.add_argument('--threshold', type=float, default=1.2,
+                            help='slowdown ratio that counts as a regression (exit status 1)')
+    run_parser.set_defaults(func=run)
+
+    record_parser = subparsers.add_parser('record', help='save a real transcript pair as a fixture')
+    record_parser.add_argument('video_id')
+    record_parser.add_argument('source_lang')
+    record_parser.add_argument('target_lang')
+    record_parser.add_argument('--fixtures', default=FIXTURES_DIR)
+    record_parser.set_defaults(func=record)
+
+    args = parser.parse_args()
+    sys.exit(args.func(args))
+
+
+if __name__ == '__main__':
+    main()
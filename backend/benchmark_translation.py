@@ -0,0 +1,102 @@
+"""Benchmark SMaLL-100 CPU inference configurations: tokens/sec and p50/p99 batch latency
+
+    python benchmark_translation.py --configs fp32,int8 --threads 4 --batch-size 16
+"""
+import argparse
+import json
+import statistics
+import time
+
+from translation_cache import TranslationCache
+
+SAMPLE_CAPTIONS = [
+    "Life is like a box of chocolates.",
+    "Today we're going to talk about how neural networks learn.",
+    "Thanks for watching, and don't forget to subscribe.",
+    "The weather in the mountains changes very quickly.",
+    "So the first thing you want to do is open the settings menu.",
+    "I never expected the results to be this good.",
+    "Let's take a closer look at what happens inside the cell.",
+    "This recipe only needs three ingredients.",
+    "The city was founded more than two thousand years ago.",
+    "Can you hear the difference between these two notes?",
+    "We tested every phone on the market this year.",
+    "Remember to stretch before you start running.",
+]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def benchmark(translator, texts, tgt_lang, batch_size, repeats, profile='caption', warmup=1):
+    """Time generate_batch over every batch of texts; returns latency and throughput stats."""
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    for batch in batches[:warmup]:
+        translator.generate_batch(batch, tgt_lang, profile)
+
+    latencies = []
+    tokens = 0
+    started = time.perf_counter()
+    for _ in range(repeats):
+        for batch in batches:
+            batch_started = time.perf_counter()
+            _, generated = translator.generate_batch(batch, tgt_lang, profile)
+            latencies.append(time.perf_counter() - batch_started)
+            tokens += generated
+    elapsed = time.perf_counter() - started
+
+    return {
+        'batches': len(latencies),
+        'tokens': tokens,
+        'tokens_per_sec': tokens / elapsed,
+        'captions_per_sec': len(texts) * repeats / elapsed,
+        'p50_ms': 1000 * statistics.median(latencies),
+        'p99_ms': 1000 * percentile(latencies, 0.99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--configs', default='fp32,int8',
+                        help='comma-separated configurations to compare: fp32, int8')
+    parser.add_argument('--threads', type=int, default=None, help='intra-op threads (default: PyTorch default)')
+    parser.add_argument('--interop-threads', type=int, default=None, help='inter-op threads')
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--captions', type=int, default=64, help='number of captions per repeat')
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--tgt-lang', default='fr')
+    parser.add_argument('--profile', default='caption', help='translation profile: keyword, caption, paragraph')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    # Imported here so --help works without loading torch
+    from test_highlighting import FastM2MTranslator, set_torch_threads
+
+    # Thread pools are process-wide, so every configuration runs with the same settings
+    set_torch_threads(args.threads, args.interop_threads)
+    texts = [SAMPLE_CAPTIONS[i % len(SAMPLE_CAPTIONS)] for i in range(args.captions)]
+
+    results = {}
+    for config in args.configs.split(','):
+        translator = FastM2MTranslator(device='cpu', cache=TranslationCache(max_entries=0),
+                                       quantize=config == 'int8')
+        results[config] = benchmark(translator, texts, args.tgt_lang, args.batch_size, args.repeats, args.profile)
+        del translator
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    import torch
+    print(f"threads={torch.get_num_threads()} interop={torch.get_num_interop_threads()} "
+          f"profile={args.profile} batch_size={args.batch_size} captions={args.captions} repeats={args.repeats}")
+    print(f"{'config':<8}{'tokens/s':>10}{'captions/s':>12}{'p50 ms':>10}{'p99 ms':>10}")
+    for config, stats in results.items():
+        print(f"{config:<8}{stats['tokens_per_sec']:>10.1f}{stats['captions_per_sec']:>12.1f}"
+              f"{stats['p50_ms']:>10.1f}{stats['p99_ms']:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""Compact columnar transcript: start/duration columns plus one UTF-8 text buffer"""
+import json
+from array import array
+from bisect import bisect_right
+
+import numpy as np
+
+_encode_text = json.encoder.encode_basestring_ascii
+
+
+def _column(buffer, fmt):
+    view = memoryview(buffer)
+    if view.format == fmt:
+        return view
+    return view.cast('B').cast(fmt) if fmt != 'B' else view.cast('B')
+
+
+class CompactTranscript:
+    """
+    Read-only transcript stored as columns instead of a list of dicts.
+
+    Starts and durations live in array('d') buffers, the texts in one UTF-8
+    buffer with an offsets column (text i is blob[offsets[i]:offsets[i + 1]]),
+    about a seventh of the memory of the equivalent list of dicts. Slicing
+    with a step of 1 returns a view sharing the parent's buffers; indexing and
+    iteration yield the usual {'text', 'start', 'duration'} dicts, so code
+    written for lists of segments keeps working.
+    """
+
+    __slots__ = ('_starts', '_durations', '_offsets', '_blob')
+
+    def __init__(self, starts, durations, offsets, blob):
+        # Any buffer (array, NumPy array, bytes, memoryview) is accepted without copying
+        self._starts = _column(starts, 'd')
+        self._durations = _column(durations, 'd')
+        self._offsets = _column(offsets, 'Q')
+        self._blob = _column(blob, 'B')
+
+    @classmethod
+    def from_segments(cls, segments):
+        if isinstance(segments, CompactTranscript):
+            return segments
+        starts = array('d')
+        durations = array('d')
+        offsets = array('Q', [0])
+        texts = []
+        position = 0
+        for segment in segments:
+            starts.append(segment['start'])
+            durations.append(segment.get('duration', 0.0))
+            encoded = segment['text'].encode('utf-8')
+            texts.append(encoded)
+            position += len(encoded)
+            offsets.append(position)
+        return cls(starts, durations, offsets, b''.join(texts))
+
+    def __len__(self):
+        return len(self._starts)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step != 1:
+                return self.take(range(start, stop, step))
+            stop = max(start, stop)
+            # Zero-copy: memoryview slices share the parent's buffers
+            return CompactTranscript(self._starts[start:stop], self._durations[start:stop],
+                                     self._offsets[start:stop + 1], self._blob)
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError('transcript index out of range')
+        return {'text': self.text(key), 'start': self._starts[key], 'duration': self._durations[key]}
+
+    def __iter__(self):
+        blob = self._blob
+        offsets = self._offsets
+        for i, (start, duration) in enumerate(zip(self._starts, self._durations)):
+            yield {'text': str(blob[offsets[i]:offsets[i + 1]], 'utf-8'), 'start': start, 'duration': duration}
+
+    def text(self, i):
+        return str(self._blob[self._offsets[i]:self._offsets[i + 1]], 'utf-8')
+
+    @property
+    def starts(self):
+        """Start times as a zero-copy float64 NumPy array."""
+        return np.frombuffer(self._starts, dtype=np.float64)
+
+    @property
+    def durations(self):
+        return np.frombuffer(self._durations, dtype=np.float64)
+
+    @property
+    def nbytes(self):
+        """Bytes referenced by this transcript (for a view: its share of the parent's buffers)."""
+        text_bytes = self._offsets[-1] - self._offsets[0] if len(self._offsets) else 0
+        return 8 * (2 * len(self) + len(self._offsets)) + text_bytes
+
+    def take(self, indices):
+        """New transcript holding the given segments (copies only those segments)."""
+        indices = np.asarray(indices, dtype=np.intp)
+        offsets = np.frombuffer(self._offsets, dtype=np.uint64)
+        lengths = offsets[indices + 1] - offsets[indices]
+        new_offsets = np.zeros(len(indices) + 1, dtype=np.uint64)
+        np.cumsum(lengths, out=new_offsets[1:])
+        blob = self._blob
+        text = b''.join([blob[offsets[i]:offsets[i + 1]] for i in indices.tolist()])
+        return CompactTranscript(self.starts[indices].copy(), self.durations[indices].copy(), new_offsets, text)
+
+    def filter(self, max_time=None, min_duration=None):
+        """
+        Segments starting at or before max_time and lasting at least min_duration.
+
+        With sorted start times (as YouTube returns them) max_time is a bisect
+        and a zero-copy slice; the duration test is one vectorized comparison.
+        """
+        view = self
+        mask = None
+        if max_time is not None:
+            starts = self.starts
+            if np.all(starts[1:] >= starts[:-1]):
+                view = self[:bisect_right(self._starts, max_time)]
+            else:
+                mask = starts <= max_time
+        if min_duration is not None:
+            durations_ok = view.durations >= min_duration
+            mask = durations_ok if mask is None else mask & durations_ok
+        if mask is None:
+            return view
+        keep = np.flatnonzero(mask)
+        if len(keep) == len(view):
+            return view
+        return view.take(keep)
+
+    def to_segments(self):
+        return list(self)
+
+    def to_json(self):
+        """
+        JSON array of the segments, as jsonify would produce it but without building dicts first.
+
+        Keys are written in jsonify's sorted order.
+        """
+        blob = self._blob
+        offsets = self._offsets
+        parts = [
+            '{"duration":%r,"start":%r,"text":%s}'
+            % (duration, start, _encode_text(str(blob[offsets[i]:offsets[i + 1]], 'utf-8')))
+            for i, (start, duration) in enumerate(zip(self._starts, self._durations))
+        ]
+        return '[' + ','.join(parts) + ']'
@@ -0,0 +1,85 @@
+"""
+Streaming transcript formatters for exports
+
+Each formatter is a generator yielding str chunks, so a response can be
+streamed instead of building the whole file in memory. The output is
+identical to youtube_transcript_api's TextFormatter, SRTFormatter,
+WebVTTFormatter and json.dumps(transcript, indent=2).
+"""
+import json
+
+# Number of cues joined into one chunk; keeps per-chunk overhead low without buffering the file
+CUES_PER_CHUNK = 256
+JSON_CHUNK_SIZE = 64 * 1024
+
+
+def _seconds_to_timestamp(time, separator):
+    time = float(time)
+    hours_float, remainder = divmod(time, 3600)
+    mins_float, secs_float = divmod(remainder, 60)
+    hours, mins, secs = int(hours_float), int(mins_float), int(secs_float)
+    ms = int(round((time - int(time)) * 1000, 2))
+    return f"{hours:02d}:{mins:02d}:{secs:02d}{separator}{ms:03d}"
+
+
+def _iter_cues(transcript, separator):
+    """Yield (index, 'start --> end', text), ending a cue early where the next one starts (as the upstream formatters do)"""
+    count = len(transcript)
+    for i, line in enumerate(transcript):
+        end = line['start'] + line['duration']
+        if i < count - 1 and transcript[i + 1]['start'] < end:
+            end = transcript[i + 1]['start']
+        time_text = f"{_seconds_to_timestamp(line['start'], separator)} --> {_seconds_to_timestamp(end, separator)}"
+        yield i, time_text, line['text']
+
+
+def _chunked(parts, joiner):
+    """Join consecutive parts into chunks of CUES_PER_CHUNK, keeping the joiner between chunks."""
+    batch = []
+    first = True
+    for part in parts:
+        batch.append(part)
+        if len(batch) == CUES_PER_CHUNK:
+            yield ('' if first else joiner) + joiner.join(batch)
+            batch = []
+            first = False
+    if batch:
+        yield ('' if first else joiner) + joiner.join(batch)
+
+
+def iter_text(transcript):
+    return _chunked((line['text'] for line in transcript), '\n')
+
+
+def iter_srt(transcript):
+    yield from _chunked((f"{i + 1}\n{time_text}\n{text}" for i, time_text, text in _iter_cues(transcript, ',')), '\n\n')
+    yield '\n'
+
+
+def iter_webvtt(transcript):
+    yield 'WEBVTT\n\n'
+    yield from _chunked((f"{time_text}\n{text}" for i, time_text, text in _iter_cues(transcript, '.')), '\n\n')
+    yield '\n'
+
+
+def iter_json(transcript):
+    buffer = []
+    size = 0
+    for piece in json.JSONEncoder(indent=2).iterencode(transcript):
+        buffer.append(piece)
+        size += len(piece)
+        if size >= JSON_CHUNK_SIZE:
+            yield ''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+# format -> (formatter, mimetype, file extension)
+EXPORT_FORMATS = {
+    'txt': (iter_text, 'text/plain', 'txt'),
+    'json': (iter_json, 'application/json', 'json'),
+    'srt': (iter_srt, 'text/plain', 'srt'),
+    'vtt': (iter_webvtt, 'text/plain', 'vtt'),
+}
@@ -0,0 +1,313 @@
+"""Bulk export jobs: fetch many (video, language) transcripts in the background and stream them out as one archive"""
+import io
+import json
+import logging
+import os
+import re
+import shutil
+import tarfile
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+
+from export_formatters import EXPORT_FORMATS
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_TYPES = {
+    'zip': 'application/zip',
+    'tar': 'application/gzip',
+}
+
+# Video IDs and language codes become archive member names, so they may not contain '/' or '.'
+VIDEO_ID_PATTERN = re.compile(r'[A-Za-z0-9_-]{1,64}')
+LANGUAGE_PATTERN = re.compile(r'[A-Za-z0-9-]{1,16}')
+
+
+def _string_list(value, name, pattern=None):
+    """value as a list of unique strings; ValueError unless it is a list of strings matching pattern"""
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        raise ValueError(f'{name} must be a list of strings')
+    if pattern is not None:
+        invalid = [item for item in value if not pattern.fullmatch(item)]
+        if invalid:
+            raise ValueError(f"Invalid {name}: {', '.join(invalid[:10])}")
+    return list(dict.fromkeys(value))
+
+
+class _ArchiveBuffer:
+    """Write-only, non-seekable file object whose contents are drained after every write burst."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class ExportJobManager:
+    """
+    Runs bulk export jobs on a bounded worker pool.
+
+    A job fetches every (video_id, lang) pair through `loader` (the same
+    store/cache path as single exports) and records per-item progress. Job
+    state is saved as JSON in jobs_dir after every item, so jobs interrupted by
+    a restart pick up where they stopped. Each fetched transcript is kept next
+    to the job state, so archives are built from those files when downloaded
+    (never held in memory as a whole, and never refetched). Finished jobs are
+    deleted max_age seconds after they finish.
+    """
+
+    def __init__(self, loader, jobs_dir, max_workers=4, max_items=5000, save_interval=1.0, max_age=7 * 24 * 3600):
+        self.loader = loader
+        self.jobs_dir = jobs_dir
+        self.max_items = max_items
+        self.save_interval = save_interval
+        self.max_age = max_age
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='export')
+        self._jobs = {}
+        self._saved_at = {}
+        self._lock = threading.Lock()
+        os.makedirs(jobs_dir, exist_ok=True)
+        self._resume_saved_jobs()
+        self.prune()
+
+    def _path(self, job_id):
+        return os.path.join(self.jobs_dir, f'{job_id}.json')
+
+    def _item_path(self, job_id, i):
+        return os.path.join(self.jobs_dir, job_id, f'{i}.json')
+
+    def _save(self, job, force=True):
+        """Atomically persist a job's state (called with self._lock held).
+
+        Progress updates (force=False) are written at most every save_interval
+        seconds; at worst a restart refetches a few items, which the transcript
+        store then serves locally.
+        """
+        now = time.monotonic()
+        if not force and now - self._saved_at.get(job['id'], 0) < self.save_interval:
+            return
+        self._saved_at[job['id']] = now
+        tmp_path = self._path(job['id']) + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(job, f)
+        os.replace(tmp_path, self._path(job['id']))
+
+    def _resume_saved_jobs(self):
+        for name in os.listdir(self.jobs_dir):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.jobs_dir, name), encoding='utf-8') as f:
+                    job = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning("export_job.unreadable file=%s error=%r", name, str(e))
+                continue
+            self._jobs[job['id']] = job
+            # Items that were queued or running when the process stopped, or whose
+            # transcript file is missing, are run again
+            pending = []
+            for i, item in enumerate(job['items']):
+                if item['status'] == 'done' and not os.path.exists(self._item_path(job['id'], i)):
+                    job['completed'] -= 1
+                    item['status'] = 'pending'
+                if item['status'] in ('pending', 'running'):
+                    item['status'] = 'pending'
+                    pending.append(i)
+            if pending or job['status'] != 'done':
+                logger.info("export_job.resume job_id=%s items=%d", job['id'], len(pending))
+                job['status'] = 'running'
+                job.pop('finished', None)
+                self._submit(job, pending)
+
+    def prune(self):
+        """Delete jobs that finished more than max_age seconds ago, with their transcripts."""
+        if self.max_age is None:
+            return
+        cutoff = time.time() - self.max_age
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job['status'] == 'done' and job.get('finished', job['created']) < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
+                self._saved_at.pop(job_id, None)
+        for job_id in expired:
+            try:
+                os.remove(self._path(job_id))
+            except FileNotFoundError:
+                pass
+            shutil.rmtree(os.path.join(self.jobs_dir, job_id), ignore_errors=True)
+        if expired:
+            logger.info("export_job.pruned count=%d", len(expired))
+
+    def create(self, video_ids, languages, formats, archive='zip'):
+        """Validate and start a job for every video_id x language; formats are applied at download time."""
+        video_ids = _string_list(video_ids, 'videoIds', VIDEO_ID_PATTERN)
+        languages = _string_list(languages, 'languages', LANGUAGE_PATTERN)
+        formats = list(dict.fromkeys(f.lower() for f in _string_list(formats, 'formats')))
+        if not video_ids or not languages or not formats:
+            raise ValueError('videoIds, languages and formats must not be empty')
+        unsupported = [f for f in formats if f not in EXPORT_FORMATS]
+        if unsupported:
+            raise ValueError(f"Unsupported formats: {', '.join(unsupported)}")
+        if not isinstance(archive, str) or archive not in ARCHIVE_TYPES:
+            raise ValueError(f'Unsupported archive type: {archive}')
+        if len(video_ids) * len(languages) > self.max_items:
+            raise ValueError(f'A job may contain at most {self.max_items} video/language pairs')
+
+        job = {
+            'id': uuid.uuid4().hex,
+            'created': time.time(),
+            'status': 'running',
+            'archive': archive,
+            'formats': formats,
+            'total': len(video_ids) * len(languages),
+            'completed': 0,
+            'failed': 0,
+            'items': [
+                {'video_id': video_id, 'lang': lang, 'status': 'pending', 'error': None}
+                for video_id in video_ids for lang in languages
+            ],
+        }
+        self.prune()
+        os.makedirs(os.path.join(self.jobs_dir, job['id']), exist_ok=True)
+        with self._lock:
+            self._jobs[job['id']] = job
+            self._save(job)
+        self._submit(job, range(job['total']))
+        return self.status(job['id'])
+
+    def _submit(self, job, indices):
+        """Queue exactly the given items; each is queued once, whatever else of the job is still queued."""
+        indices = list(indices)
+        if not indices:
+            self._finish(job)
+        for i in indices:
+            self.executor.submit(self._run_item, job, i)
+
+    def _run_item(self, job, i):
+        item = job['items'][i]
+        with self._lock:
+            if item['status'] != 'pending':
+                return
+            item['status'] = 'running'
+        try:
+            transcript_data = self.loader(item['video_id'], item['lang'])
+            path = self._item_path(job['id'], i)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(transcript_data, f)
+            os.replace(path + '.tmp', path)
+            status, error = 'done', None
+        except Exception as e:
+            status, error = 'error', str(e)
+        with self._lock:
+            item['status'] = status
+            item['error'] = error
+            job['completed' if status == 'done' else 'failed'] += 1
+            finished = job['completed'] + job['failed'] >= job['total']
+            if finished:
+                job['status'] = 'done'
+                job['finished'] = time.time()
+            self._save(job, force=finished)
+
+    def _finish(self, job):
+        with self._lock:
+            job['status'] = 'done'
+            job['finished'] = time.time()
+            self._save(job)
+
+    def retry_failed(self, job_id):
+        """Reset a job's failed items to pending and run them again; returns the new status, or None."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            reset = []
+            for i, item in enumerate(job['items']):
+                if item['status'] == 'error':
+                    item['status'] = 'pending'
+                    item['error'] = None
+                    job['failed'] -= 1
+                    reset.append(i)
+            if reset:
+                job['status'] = 'running'
+                job.pop('finished', None)
+                self._save(job)
+        # Only the items just reset: anything else still pending is already queued
+        for i in reset:
+            self.executor.submit(self._run_item, job, i)
+        return self.status(job_id)
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def status(self, job_id):
+        """Progress summary of a job (without the per-item list), or None."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            summary = {key: value for key, value in job.items() if key != 'items'}
+            summary['progress'] = (job['completed'] + job['failed']) / job['total'] if job['total'] else 1.0
+            summary['errors'] = {f"{item['video_id']}/{item['lang']}": item['error']
+                                 for item in job['items'] if item['status'] == 'error'}
+            return summary
+
+    def _entries(self, job):
+        """Yield (archive name, formatter, transcript) for every successful item and format."""
+        with self._lock:
+            items = [(i, dict(item)) for i, item in enumerate(job['items']) if item['status'] == 'done']
+        for i, item in items:
+            with open(self._item_path(job['id'], i), encoding='utf-8') as f:
+                transcript_data = json.load(f)
+            for format_type in job['formats']:
+                formatter, mimetype, extension = EXPORT_FORMATS[format_type]
+                name = f"{item['video_id']}/{item['video_id']}_{item['lang']}.{extension}"
+                yield name, formatter, transcript_data
+
+    def iter_archive(self, job_id, archive=None):
+        """Stream the job's archive as bytes chunks, one transcript at a time."""
+        job = self.get(job_id)
+        archive = archive or job['archive']
+        errors = self.status(job_id)['errors']
+        buffer = _ArchiveBuffer()
+
+        if archive == 'zip':
+            with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+                for name, formatter, transcript_data in self._entries(job):
+                    with zf.open(name, 'w') as entry:
+                        for chunk in formatter(transcript_data):
+                            entry.write(chunk.encode('utf-8'))
+                            yield buffer.drain()
+                if errors:
+                    zf.writestr('errors.json', json.dumps(errors, indent=2))
+            yield buffer.drain()
+            return
+
+        # tar headers need the entry size up front, so each file (not the archive) is formatted in memory
+        with tarfile.open(fileobj=buffer, mode='w|gz') as tf:
+            entries = ((name, ''.join(formatter(data)).encode('utf-8')) for name, formatter, data in self._entries(job))
+            if errors:
+                entries = chain(entries, [('errors.json', json.dumps(errors, indent=2).encode('utf-8'))])
+            for name, data in entries:
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                info.mtime = int(time.time())
+                tf.addfile(info, io.BytesIO(data))
+                yield buffer.drain()
+        yield buffer.drain()
@@ -1,7 +1,95 @@
-from multi_rake import Rake
+"""Keyword extraction helpers: RAKE for free text, YAKE for caption segments"""
+from functools import lru_cache
+import re
+import threading
 
-rake = Rake()
+from metrics import timed_stage
+
+_rake = None
+_rake_lock = threading.Lock()
+
+WORD_PATTERN = re.compile(r"\w+(?:[-']\w+)*")
+
+def get_rake():
+    """Return the shared Rake instance, created on first use"""
+    global _rake
+    with _rake_lock:
+        if _rake is None:
+            from multi_rake import Rake
+            _rake = Rake()
+        return _rake
 
 def extract_keywords(text):
-    keywords = rake.apply(text)
+    keywords = get_rake().apply(text)
     return [keyword[0] for keyword in keywords]  # Only return the keywords
+
+def extract_keywords_batch(texts):
+    """RAKE keywords for several texts with one shared extractor"""
+    rake = get_rake()
+    return [[keyword[0] for keyword in rake.apply(text)] for text in texts]
+
+@lru_cache(maxsize=128)
+def get_yake_extractor(language, n=1, top=1):
+    """Return a cached YAKE extractor for (language, n, top)"""
+    import yake
+    return yake.KeywordExtractor(lan=language, n=n, top=top)
+
+def extract_yake_keywords(text, language, n=1, top=1, min_length=3):
+    """YAKE keywords of a single text, dropping keywords shorter than min_length"""
+    keywords = get_yake_extractor(language, n, top).extract_keywords(text)
+    return [keyword for keyword, score in keywords if len(keyword) >= min_length]
+
+@lru_cache(maxsize=32)
+def get_yake_document_scorer(language, n=1):
+    """Return a cached YAKE extractor that scores every candidate, without deduplication"""
+    import yake
+    # dedup_lim=1.0 skips YAKE's pairwise similarity pass; top=None keeps all candidates
+    return yake.KeywordExtractor(lan=language, n=n, top=None, dedup_lim=1.0)
+
+def document_keyword_scores(texts, language, n=1):
+    """Score every candidate term once over the whole transcript (lower is better)"""
+    document = '\n'.join(text for text in texts if text)
+    if not document:
+        return {}
+    extractor = get_yake_document_scorer(language, n)
+    scores = {}
+    for keyword, score in extractor.extract_keywords(document):
+        scores.setdefault(keyword.lower(), float(score))
+    return scores
+
+@timed_stage('keyword_extraction')
+def extract_segment_keywords(texts, language, n=1, top=1, min_length=3, document_level=False,
+                             document_texts=None):
+    """
+    Extract keywords for a list of segment texts in one call.
+
+    By default every segment is scored on its own with a shared, cached YAKE
+    extractor. With document_level=True the transcript is scored once and each
+    segment picks its best-scoring words from those document-level statistics;
+    segments without any scored word fall back to per-segment extraction.
+    document_texts lets a window of segments be scored against the whole
+    transcript (defaults to texts).
+    """
+    if not document_level:
+        return [extract_yake_keywords(text, language, n, top, min_length) if text else [] for text in texts]
+
+    scores = document_keyword_scores(texts if document_texts is None else document_texts, language, n)
+    results = []
+    for text in texts:
+        if not text:
+            results.append([])
+            continue
+        words = WORD_PATTERN.findall(text)
+        candidates = {}
+        for size in range(1, n + 1):
+            for start in range(len(words) - size + 1):
+                phrase = ' '.join(words[start:start + size])
+                score = scores.get(phrase.lower())
+                if score is not None and len(phrase) >= min_length:
+                    candidates.setdefault(phrase.lower(), (score, phrase))
+        if candidates:
+            ranked = sorted(candidates.values())
+            results.append([word for score, word in ranked[:top]])
+        else:
+            results.append(extract_yake_keywords(text, language, n, top, min_length))
+    return results
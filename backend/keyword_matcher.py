@@ -0,0 +1,70 @@
+"""Find many keywords in caption text in one pass, returning match spans rather than marked-up text"""
+import re
+from functools import lru_cache
+
+
+class KeywordMatcher:
+    """
+    A set of keywords compiled into one case-insensitive pattern.
+
+    Keywords match as whole words. Longer keywords are tried first, so at any
+    position the longest keyword wins and the returned spans never overlap.
+    Spans are (start, end) code point offsets into the original text.
+
+    Build one per keyword set to be found (e.g. one caption's keywords) through
+    keyword_matcher(), which caches them: a pattern shared by several keyword
+    sets would let one set's longer keyword hide another set's shorter one.
+    """
+
+    __slots__ = ('keywords', '_by_lower', '_pattern')
+
+    def __init__(self, keywords):
+        self._by_lower = {}
+        for keyword in keywords:
+            if keyword:
+                self._by_lower.setdefault(keyword.lower(), keyword)
+        self.keywords = tuple(self._by_lower.values())
+        self._pattern = None
+        if self._by_lower:
+            alternatives = sorted(self._by_lower, key=len, reverse=True)
+            self._pattern = re.compile(r'\b(?:' + '|'.join(map(re.escape, alternatives)) + r')\b', re.IGNORECASE)
+
+    def __bool__(self):
+        return self._pattern is not None
+
+    def _keyword_of(self, matched):
+        keyword = self._by_lower.get(matched.lower())
+        if keyword is None:
+            # Case folding that changes length (e.g. 'İ'): fall back to a per-keyword comparison
+            keyword = next(k for k in self.keywords if re.fullmatch(re.escape(k), matched, re.IGNORECASE))
+        return keyword
+
+    def matches(self, text):
+        """(start, end, keyword) for every match in text."""
+        if self._pattern is None or not text:
+            return []
+        return [(match.start(), match.end(), self._keyword_of(match.group())) for match in self._pattern.finditer(text)]
+
+    def spans(self, text):
+        """(start, end) of every match in text."""
+        return [(start, end) for start, end, _ in self.matches(text)]
+
+
+@lru_cache(maxsize=4096)
+def keyword_matcher(keywords):
+    """A cached KeywordMatcher for a tuple of keywords; pass them sorted so equal sets share one entry"""
+    return KeywordMatcher(keywords)
+
+
+def render_spans(text, spans, before, after):
+    """Wrap every (start, end) span of text in before/after markup; spans must be sorted and not overlap."""
+    parts = []
+    cursor = 0
+    for start, end in spans:
+        parts.append(text[cursor:start])
+        parts.append(before)
+        parts.append(text[start:end])
+        parts.append(after)
+        cursor = end
+    parts.append(text[cursor:])
+    return ''.join(parts)
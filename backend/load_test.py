@@ -0,0 +1,235 @@
+"""
+Replay page-load traffic against the backend and report throughput, latency percentiles and upstream calls
+
+    python load_test.py --pages 500 --concurrency 16              # in-process app with TRANSCRIPT_SOURCE=fake
+    python load_test.py --url http://localhost:5000 --duration 60  # a running server (start it with TRANSCRIPT_SOURCE=fake)
+
+One page load is what the extension does when a video opens: list-transcripts,
+then get-transcript for a few languages, sometimes an export and sometimes a
+multi-language fetch. Videos are drawn from a fixed pool with a skewed
+popularity, so popular videos hit the caches and the long tail goes upstream.
+Upstream call counts come from /api/cache-stats before and after the run.
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from urllib.parse import urlencode
+
+
+class HTTPClient:
+    """Minimal JSON client for a running server."""
+
+    def __init__(self, base_url, timeout=60):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def request(self, method, path, params=None, body=None):
+        url = self.base_url + path + ('?' + urlencode(params) if params else '')
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        req = urllib.request.Request(url, data=data, method=method, headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+
+class InProcessClient:
+    """The same interface on top of Flask's test client; one per thread."""
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def request(self, method, path, params=None, body=None):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        response = client.open(path, method=method, query_string=params, json=body)
+        return response.status_code, response.get_data()
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.statuses = {}
+        self.pages = 0
+
+    def add(self, endpoint, status, seconds):
+        with self._lock:
+            self.latencies.setdefault(endpoint, []).append(seconds)
+            counts = self.statuses.setdefault(endpoint, {})
+            counts[status] = counts.get(status, 0) + 1
+
+    def page_done(self):
+        with self._lock:
+            self.pages += 1
+
+
+def timed(recorder, client, endpoint, method, path, params=None, body=None):
+    started = time.perf_counter()
+    try:
+        status, payload = client.request(method, path, params, body)
+    except OSError:
+        status, payload = 'connection-error', b''
+    recorder.add(endpoint, status, time.perf_counter() - started)
+    return status, payload
+
+
+def page_load(client, recorder, rng, args):
+    """One video opened in the extension."""
+    # Zipf-like popularity over the video pool
+    video_id = f'video{min(int(rng.paretovariate(args.popularity)) - 1, args.videos - 1):05d}'
+    status, payload = timed(recorder, client, 'list-transcripts', 'GET', '/api/list-transcripts',
+                            {'videoId': video_id})
+    if status != 200:
+        recorder.page_done()
+        return
+    available = [t['language_code'] for t in json.loads(payload)['transcripts']]
+    languages = list(dict.fromkeys(available[:1] + rng.sample(args.languages, min(args.get_per_page,
+                                                                                  len(args.languages)))))
+
+    for lang in languages[:args.get_per_page]:
+        timed(recorder, client, 'get-transcript', 'GET', '/api/get-transcript', {'videoId': video_id, 'lang': lang})
+    if rng.random() < args.export_rate:
+        timed(recorder, client, 'export-transcript', 'GET', '/api/export-transcript',
+              {'videoId': video_id, 'lang': languages[0], 'format': rng.choice(['srt', 'vtt', 'txt', 'json'])})
+    if rng.random() < args.multi_rate:
+        timed(recorder, client, 'get-multiple-transcripts', 'POST', '/api/get-multiple-transcripts',
+              body={'videoId': video_id, 'languages': languages})
+    recorder.page_done()
+
+
+def upstream_stats(client):
+    status, payload = client.request('GET', '/api/cache-stats')
+    if status != 200:
+        return {}
+    stats = json.loads(payload)
+    return dict(stats.get('transcript_source', {}), transcript_lists=stats.get('transcript_lists', {}))
+
+
+def run(client, args):
+    recorder = Recorder()
+    before = upstream_stats(client)
+    deadline = time.monotonic() + args.duration if args.duration else None
+    remaining = [args.pages]
+    lock = threading.Lock()
+
+    def worker(index):
+        rng = random.Random(args.seed * 1000 + index)
+        while True:
+            with lock:
+                if deadline is None:
+                    if remaining[0] <= 0:
+                        return
+                    remaining[0] -= 1
+                elif time.monotonic() >= deadline:
+                    return
+            page_load(client, recorder, rng, args)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    after = upstream_stats(client)
+
+    endpoints = {}
+    for endpoint, latencies in recorder.latencies.items():
+        endpoints[endpoint] = {
+            'requests': len(latencies),
+            'statuses': {str(status): count for status, count in sorted(recorder.statuses[endpoint].items(),
+                                                                        key=lambda item: str(item[0]))},
+            'p50_ms': 1000 * statistics.median(latencies),
+            'p90_ms': 1000 * percentile(latencies, 0.90),
+            'p99_ms': 1000 * percentile(latencies, 0.99),
+            'max_ms': 1000 * max(latencies),
+        }
+    upstream = {name: after[name] - before.get(name, 0) for name in ('list', 'fetch', 'translate', 'errors')
+                if isinstance(after.get(name), int)}
+    requests = sum(len(latencies) for latencies in recorder.latencies.values())
+    return {
+        'pages': recorder.pages,
+        'requests': requests,
+        'seconds': elapsed,
+        'pages_per_sec': recorder.pages / elapsed,
+        'requests_per_sec': requests / elapsed,
+        'endpoints': endpoints,
+        'upstream_calls': upstream,
+        'transcript_lists': after.get('transcript_lists', {}),
+    }
+
+
+def print_report(report):
+    print(f"{report['pages']} pages, {report['requests']} requests in {report['seconds']:.1f}s: "
+          f"{report['pages_per_sec']:.1f} pages/s, {report['requests_per_sec']:.1f} requests/s")
+    print(f"{'endpoint':<26}{'requests':>9}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'max ms':>9}  statuses")
+    for endpoint, stats in sorted(report['endpoints'].items()):
+        statuses = ' '.join(f'{status}:{count}' for status, count in stats['statuses'].items())
+        print(f"{endpoint:<26}{stats['requests']:>9}{stats['p50_ms']:>9.1f}{stats['p90_ms']:>9.1f}"
+              f"{stats['p99_ms']:>9.1f}{stats['max_ms']:>9.1f}  {statuses}")
+    if report['upstream_calls']:
+        calls = ', '.join(f'{name}={count}' for name, count in report['upstream_calls'].items())
+        print(f"upstream calls: {calls}")
+    else:
+        print("upstream calls: not reported (is the server running with TRANSCRIPT_SOURCE=fake?)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay page-load traffic against the backend')
+    parser.add_argument('--url', default=None, help='base URL of a running server (default: in-process app)')
+    parser.add_argument('--pages', type=int, default=200, help='page loads to replay')
+    parser.add_argument('--duration', type=float, default=None, help='run for this many seconds instead of --pages')
+    parser.add_argument('--concurrency', type=int, default=8, help='simultaneous page loads')
+    parser.add_argument('--videos', type=int, default=200, help='size of the video pool')
+    parser.add_argument('--popularity', type=float, default=1.2,
+                        help='Pareto shape of video popularity; lower means a longer tail')
+    parser.add_argument('--languages', default='en,es,fr,de,ja', help='languages a page may request')
+    parser.add_argument('--get-per-page', type=int, default=2, help='get-transcript calls per page load')
+    parser.add_argument('--export-rate', type=float, default=0.1, help='fraction of page loads that export')
+    parser.add_argument('--multi-rate', type=float, default=0.3,
+                        help='fraction of page loads that fetch all languages at once')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args()
+    args.languages = args.languages.split(',')
+
+    if args.url:
+        client = HTTPClient(args.url)
+    else:
+        import os
+        import tempfile
+        # A fresh store, so the run starts cold and never touches the real one
+        scratch = tempfile.mkdtemp(prefix='captioncraft-load-')
+        os.environ.setdefault('TRANSCRIPT_SOURCE', 'fake')
+        os.environ.setdefault('TRANSCRIPT_STORE_PATH', os.path.join(scratch, 'transcripts.sqlite3'))
+        os.environ.setdefault('EXPORT_JOBS_DIR', os.path.join(scratch, 'export_jobs'))
+        # The replayed routes never translate, so do not load the model
+        os.environ.setdefault('TRANSLATOR_WARMUP', '0')
+        from app import app
+        client = InProcessClient(app)
+
+    report = run(client, args)
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        print_report(report)
+
+
+if __name__ == '__main__':
+    main()
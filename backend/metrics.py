@@ -0,0 +1,109 @@
+"""Latency histograms for endpoints and processing stages, rendered in the Prometheus text format"""
+import bisect
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; covers cache hits (sub-millisecond) up to slow upstream fetches and model loads
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class Histogram:
+    """A labelled Prometheus histogram; observations are counted per bucket and summed."""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts (the last one is +Inf), sum
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted((key, list(counts), total) for key, (counts, total) in self._series.items())
+        for key, counts, total in series:
+            labels = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{self.name}_bucket{_format_labels(labels + [("le", le)])} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(labels)} {total!r}')
+            lines.append(f'{self.name}_count{_format_labels(labels)} {cumulative}')
+        return '\n'.join(lines)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Every metric in the Prometheus text exposition format (version 0.0.4)."""
+        return '\n'.join(metric.render() for metric in self._metrics) + '\n'
+
+
+registry = Registry()
+
+request_seconds = registry.histogram(
+    'captioncraft_request_seconds',
+    'Time to produce a response (streamed bodies: until the first byte)',
+    ('endpoint', 'method', 'status'),
+)
+stage_seconds = registry.histogram(
+    'captioncraft_stage_seconds',
+    'Time spent in one processing stage',
+    ('stage',),
+)
+
+
+def stage(name):
+    """Context manager timing one stage: `with stage('upstream_fetch'): ...`"""
+    return stage_seconds.time(stage=name)
+
+
+def timed_stage(name):
+    """Decorator form of stage()."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage_seconds.time(stage=name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
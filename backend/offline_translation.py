@@ -0,0 +1,59 @@
+"""Whole-transcript translation with the local SMaLL-100 model, instead of YouTube's machine translation"""
+
+MODEL_TAG = 'small100'
+
+# YouTube language codes that differ from the model's
+LANGUAGE_ALIASES = {
+    'iw': 'he',
+    'jw': 'jv',
+    'fil': 'tl',
+    'nb': 'no',
+    'zh-Hans': 'zh',
+    'zh-Hant': 'zh',
+}
+
+_model_languages = None
+
+
+def model_languages():
+    """The language codes SMaLL-100 can translate to and from"""
+    global _model_languages
+    if _model_languages is None:
+        from tokenization_small100 import FAIRSEQ_LANGUAGE_CODES
+        _model_languages = frozenset(FAIRSEQ_LANGUAGE_CODES['m2m100'])
+    return _model_languages
+
+
+def model_language(code):
+    """Map a YouTube language code (e.g. 'pt-BR', 'iw') to the model's code, or None if unsupported"""
+    code = LANGUAGE_ALIASES.get(code, code)
+    code = LANGUAGE_ALIASES.get(code.split('-')[0], code.split('-')[0])
+    return code if code in model_languages() else None
+
+
+def translated_from_tag(src_lang):
+    """translated_from value marking a transcript store entry as a local model translation"""
+    return f'{src_lang}:{MODEL_TAG}'
+
+
+def translate_captions(segments, src_lang, tgt_lang, translator, batch_size=32):
+    """
+    Translate every caption of a transcript, keeping its timing.
+
+    src_lang and tgt_lang are model language codes. Captions go through
+    translator.translate_batch, which serves repeats from the translation
+    cache and sorts the rest by length into padded batches.
+    """
+    texts = [segment['text'] for segment in segments]
+    unique_texts = list(dict.fromkeys(text for text in texts if text.strip()))
+    translations = dict(zip(
+        unique_texts,
+        translator.translate_batch([(text, src_lang, tgt_lang) for text in unique_texts],
+                                   batch_size=batch_size, profile='caption'),
+    ))
+    return [
+        {'text': translations.get(segment['text'], segment['text']),
+         'start': segment['start'],
+         'duration': segment['duration']}
+        for segment in segments
+    ]
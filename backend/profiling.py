@@ -0,0 +1,144 @@
+"""Capture cProfile or sampling profiles of the next N requests, switched on at runtime"""
+import collections
+import cProfile
+import io
+import itertools
+import os
+import pstats
+import sys
+import threading
+import time
+
+PROFILE_MODES = ('cprofile', 'sampling')
+
+
+class _CProfileSession:
+    def __init__(self, sort, limit):
+        self.sort = sort
+        self.limit = limit
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+        stream = io.StringIO()
+        pstats.Stats(self.profile, stream=stream).sort_stats(self.sort).print_stats(self.limit)
+        return stream.getvalue()
+
+
+class _SamplingSession:
+    """Samples the request thread's stack every interval seconds; reports collapsed stacks (flamegraph input)."""
+
+    def __init__(self, interval, limit):
+        self.interval = interval
+        self.limit = limit
+        self.thread_id = threading.get_ident()
+        self.samples = collections.Counter()
+        self._stopped = threading.Event()
+        self._sampler = threading.Thread(target=self._run, name='request-sampler', daemon=True)
+        self._sampler.start()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stopped.set()
+        self._sampler.join()
+        total = sum(self.samples.values())
+        lines = [f'# {total} samples every {1000 * self.interval:g} ms']
+        lines += [f'{stack} {count}' for stack, count in self.samples.most_common(self.limit)]
+        return '\n'.join(lines) + '\n'
+
+
+class RequestProfiler:
+    """
+    Admin switch for profiling live traffic.
+
+    arm() asks for the next `count` requests (optionally only those under a path
+    prefix) to be profiled. Requests are profiled one at a time, so a request
+    that arrives while another is being profiled simply runs unprofiled and
+    does not use up the budget. The last max_reports reports are kept.
+    """
+
+    def __init__(self, max_reports=20, sample_interval=0.005):
+        self.sample_interval = sample_interval
+        self._reports = collections.OrderedDict()
+        self._max_reports = max_reports
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._active = threading.Lock()
+        self._remaining = 0
+        self._settings = {}
+
+    def arm(self, count, mode='cprofile', path_prefix='', sort='cumulative', limit=50):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"mode must be one of: {', '.join(PROFILE_MODES)}")
+        if sort not in pstats.Stats.sort_arg_dict_default:
+            raise ValueError(f'Unknown sort key: {sort}')
+        with self._lock:
+            self._remaining = count
+            self._settings = {'mode': mode, 'path_prefix': path_prefix, 'sort': sort, 'limit': limit}
+        return self.status()
+
+    def start(self, path):
+        """Start profiling the current request if it is wanted; returns a session for finish(), or None."""
+        with self._lock:
+            if self._remaining <= 0 or not path.startswith(self._settings['path_prefix']):
+                return None
+            if not self._active.acquire(blocking=False):
+                return None
+            self._remaining -= 1
+            settings = dict(self._settings)
+        try:
+            if settings['mode'] == 'sampling':
+                session = _SamplingSession(self.sample_interval, settings['limit'])
+            else:
+                session = _CProfileSession(settings['sort'], settings['limit'])
+        except Exception:
+            self._active.release()
+            raise
+        session.mode = settings['mode']
+        session.started = time.perf_counter()
+        return session
+
+    def finish(self, session, method, path, status):
+        try:
+            duration = time.perf_counter() - session.started
+            report = session.stop()
+        finally:
+            self._active.release()
+        with self._lock:
+            report_id = next(self._ids)
+            self._reports[report_id] = {
+                'id': report_id,
+                'mode': session.mode,
+                'method': method,
+                'path': path,
+                'status': status,
+                'duration_ms': 1000 * duration,
+                'created': time.time(),
+                'report': report,
+            }
+            while len(self._reports) > self._max_reports:
+                self._reports.popitem(last=False)
+
+    def report(self, report_id):
+        with self._lock:
+            return self._reports.get(report_id)
+
+    def status(self):
+        with self._lock:
+            return {
+                'remaining': self._remaining,
+                'settings': dict(self._settings),
+                'reports': [{name: value for name, value in report.items() if name != 'report'}
+                            for report in self._reports.values()],
+            }
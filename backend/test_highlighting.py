@@ -1,70 +1,148 @@
 """Test script to demonstrate keyword highlighting across two languages"""
+import logging
 import random
 from youtube_transcript_api import YouTubeTranscriptApi
-import yake
-from transformers import M2M100ForConditionalGeneration
-from tokenization_small100 import SMALL100Tokenizer
-import torch
-from functools import lru_cache
+from compact_transcript import CompactTranscript
+from extract_keywords import extract_segment_keywords, extract_yake_keywords
+from keyword_matcher import keyword_matcher, render_spans
+from metrics import stage
+from offline_translation import model_language
+from translation_cache import shared_translation_cache, translation_key
+from translator_registry import translator_registry
 import re
 
+logger = logging.getLogger(__name__)
+
+# Decoding settings per kind of input: max_new_tokens = min(max_tokens, ratio * input tokens + extra)
+TRANSLATION_PROFILES = {
+    # Single words and short phrases: greedy, a handful of tokens
+    'keyword': {'num_beams': 1, 'ratio': 2.0, 'extra': 4, 'max_tokens': 16},
+    # One caption line: narrow beam, stop as soon as every beam is done
+    'caption': {'num_beams': 2, 'ratio': 1.5, 'extra': 8, 'max_tokens': 96},
+    # Full sentences or paragraphs: the model's usual wider beam
+    'paragraph': {'num_beams': 4, 'ratio': 2.0, 'extra': 16, 'max_tokens': 256},
+}
+
+def generation_kwargs(profile, input_tokens):
+    """generate() arguments for a translation profile and the longest input of a batch (in tokens)"""
+    try:
+        settings = TRANSLATION_PROFILES[profile]
+    except KeyError:
+        raise ValueError(f"Unknown translation profile: {profile}") from None
+    kwargs = {
+        'num_beams': settings['num_beams'],
+        'do_sample': False,
+        'max_new_tokens': min(settings['max_tokens'], int(settings['ratio'] * input_tokens) + settings['extra']),
+    }
+    if settings['num_beams'] > 1:
+        kwargs['early_stopping'] = True
+    return kwargs
+
+def set_torch_threads(num_threads=None, interop_threads=None):
+    """Pin PyTorch's intra-op and inter-op thread pools (inter-op can only be set before first use)."""
+    import torch
+    if num_threads:
+        torch.set_num_threads(num_threads)
+    if interop_threads:
+        try:
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError as e:
+            logger.warning("torch.interop_threads_failed threads=%d error=%r", interop_threads, str(e))
+
 class FastM2MTranslator:
-    def __init__(self, device="mps" if torch.backends.mps.is_available() else "cpu"):
-        self.device = device
-        model_name = "alirezamsh/small100"
-        print(f"Loading {model_name} on {self.device}...")
-        self.model = M2M100ForConditionalGeneration.from_pretrained(model_name)
-        if self.device != "cpu":
+    def __init__(self, device=None, cache=None, quantize=False, num_threads=None, interop_threads=None):
+        """
+        device defaults to "mps" when available, else "cpu". quantize=True
+        applies dynamic int8 quantization to the linear layers (CPU only);
+        num_threads/interop_threads pin PyTorch's thread pools.
+        """
+        # Imported here so importing this module (e.g. for the alignment helpers) stays cheap
+        import torch
+        from transformers import M2M100ForConditionalGeneration
+        from tokenization_small100 import SMALL100Tokenizer
+
+        self.torch = torch
+        self.device = device or ("mps" if torch.backends.mps.is_available() else "cpu")
+        self.model_name = "alirezamsh/small100"
+        self.quantize = quantize and self.device == "cpu"
+        # Quantized outputs can differ slightly, so they get their own cache entries
+        self.model_id = self.model_name + ("+int8" if self.quantize else "")
+        set_torch_threads(num_threads, interop_threads)
+        logger.info("translator.load model=%s device=%s", self.model_id, self.device)
+        self.model = M2M100ForConditionalGeneration.from_pretrained(self.model_name)
+        self.model.eval()
+        if self.quantize:
+            self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+        elif self.device != "cpu":
             self.model = self.model.to(self.device)
-        self.tokenizer = SMALL100Tokenizer.from_pretrained(model_name)
+        self.tokenizer = SMALL100Tokenizer.from_pretrained(self.model_name)
+        self.cache = cache if cache is not None else shared_translation_cache()
 
-    @lru_cache(maxsize=1000)
     def translate_keyword(self, text, src_lang, tgt_lang):
         """Simple keyword translation."""
-        self.tokenizer.tgt_lang = tgt_lang
-        encoded = self.tokenizer(text, return_tensors="pt").to(self.device)
-        generated_tokens = self.model.generate(**encoded)
-        return self.tokenizer.batch_decode(generated_tokens, skip_special_tokens=True)[0]
+        return self.translate_batch([(text, src_lang, tgt_lang)], profile='keyword')[0]
+
+    def translate_batch(self, items, batch_size=32, profile='caption'):
+        """Translate a list of (text, src_lang, tgt_lang) items, returning results in input order.
+
+        Cached translations are served from the translation cache; the rest are
+        grouped by target language, sorted by length and padded into batches,
+        so each batch costs a single generate call. profile picks the decoding
+        settings from TRANSLATION_PROFILES and is part of the cache key.
+        """
+        model_id = f"{self.model_id}:{profile}"
+        keys = [translation_key(text, src_lang, tgt_lang, model_id) for text, src_lang, tgt_lang in items]
+        translations = self.cache.get_many(keys)
+
+        by_target = {}
+        for key in keys:
+            if key not in translations:
+                # SMaLL-100 only conditions on the target language, so duplicates share a slot
+                by_target.setdefault(key[2], {}).setdefault(key[0], set()).add(key)
+
+        for tgt_lang, pending in by_target.items():
+            texts = sorted(pending, key=len)
+            for start in range(0, len(texts), batch_size):
+                batch = texts[start:start + batch_size]
+                decoded, _ = self.generate_batch(batch, tgt_lang, profile)
+                new_translations = {key: translation for text, translation in zip(batch, decoded)
+                                    for key in pending[text]}
+                self.cache.put_many(new_translations)
+                translations.update(new_translations)
+
+        return [translations[key] for key in keys]
+
+    def generate_batch(self, texts, tgt_lang, profile='caption'):
+        """Translate one padded batch without the cache; returns (translations, generated token count)."""
+        with stage('tokenize'):
+            encoded = self.tokenizer.encode_for_target(texts, tgt_lang, return_tensors="pt").to(self.device)
+        kwargs = generation_kwargs(profile, encoded["input_ids"].shape[1])
+        with stage('generate'), self.torch.inference_mode():
+            generated_tokens = self.model.generate(**encoded, **kwargs)
+        with stage('detokenize'):
+            decoded = self.tokenizer.decode_many(generated_tokens, skip_special_tokens=True)
+        # Every row starts with the decoder start token, which is not generated
+        generated = int((generated_tokens != self.tokenizer.pad_token_id).sum()) - len(texts)
+        return decoded, generated
+
+    def warmup(self, tgt_lang='fr'):
+        """One uncached generate call, so the first real request does not pay for lazy initialization."""
+        self.generate_batch(["Hello world."], tgt_lang, 'keyword')
+
+def find_keyword_spans(text, keyword):
+    """Return the (start, end) offsets of every whole-word, case-insensitive match of keyword in text."""
+    return keyword_matcher((keyword,)).spans(text)
 
 def highlight_text(text, keyword):
-    """Highlight exact keyword match in text."""
-    text_lower = text.lower()
-    keyword_lower = keyword.lower()
-    
-    # Find all word boundaries including handling punctuation and special characters
-    matches = list(re.finditer(r'\b' + re.escape(keyword_lower) + r'\b', text_lower))
-    found = False
-    
-    if matches:
-        # Convert text to list to make character-level modifications
-        text_chars = list(text)
-        for match in matches:
-            start, end = match.span()
-            # Get the original case version of the matched word
-            original_word = text[start:end]
-            # Add highlighting
-            text_chars[start:end] = list(f"\033[1;33m{original_word}\033[0m")
-            found = True
-            # print(f"Found match: '{original_word}'")
-        
-        text = ''.join(text_chars)
-    
-    return text, found
+    """Highlight exact keyword matches in text for the terminal; returns (text, found)."""
+    spans = find_keyword_spans(text, keyword)
+    if not spans:
+        return text, False
+    return render_spans(text, spans, "\033[1;33m", "\033[0m"), True
 
 def extract_keywords(text, language, min_length=3):
     """Extract a single most important keyword (1-gram) from text using YAKE."""
-    kw_extractor = yake.KeywordExtractor(
-        lan=language,
-        n=1,        # unigrams only
-        top=1       # only get top keyword
-    )
-    keywords = kw_extractor.extract_keywords(text)
-    
-    if keywords:
-        keyword, score = keywords[0]
-        # print(f"YAKE selected: '{keyword}' (score: {score:.4f})")
-        return [keyword] if len(keyword) >= min_length else []
-    return []
+    return extract_yake_keywords(text, language, n=1, top=1, min_length=min_length)
 
 def find_matching_segment(source_segment, target_segments, time_threshold=0.5):
     """Find the matching segment in target language based on timestamp."""
@@ -82,6 +160,40 @@ def find_matching_segment(source_segment, target_segments, time_threshold=0.5):
     
     return None
 
+def align_segments(source_segments, target_segments, time_threshold=0.5):
+    """Match every source segment to a target segment in one sweep.
+
+    Returns a list holding, for each source segment, the index of its matching
+    target segment or None. The match rule is the one of find_matching_segment
+    (start and end both within time_threshold, first target in input order wins),
+    but both sides are sorted by start time and swept with two pointers instead
+    of scanning all targets for every source.
+    """
+    targets = sorted(range(len(target_segments)), key=lambda i: target_segments[i]['start'])
+    target_starts = [target_segments[i]['start'] for i in targets]
+    sources = sorted(range(len(source_segments)), key=lambda i: source_segments[i]['start'])
+
+    mapping = [None] * len(source_segments)
+    lo = 0
+    for source_index in sources:
+        source_start = source_segments[source_index]['start']
+        source_end = source_start + source_segments[source_index]['duration']
+
+        # Targets starting time_threshold or more before this source can't match it or any later one
+        while lo < len(targets) and source_start - target_starts[lo] >= time_threshold:
+            lo += 1
+
+        j = lo
+        while j < len(targets) and target_starts[j] - source_start < time_threshold:
+            target_index = targets[j]
+            target_end = target_starts[j] + target_segments[target_index]['duration']
+            if (abs(source_end - target_end) < time_threshold and
+                    (mapping[source_index] is None or target_index < mapping[source_index])):
+                mapping[source_index] = target_index
+            j += 1
+
+    return mapping
+
 def clean_caption_text(text):
     """Remove text within parentheses, proper nouns (capitalized words), and clean up whitespace."""
     # Remove text within parentheses
@@ -99,25 +211,30 @@ def clean_caption_text(text):
     # print(f"Cleaned text for YAKE: '{cleaned}'")  # Debug print
     return cleaned
 
-def process_transcripts(video_id, source_lang, target_lang, max_time=60, min_duration=2.0):
-    """Process and highlight keywords in two transcripts. Returns a dictionary of matched word pairs."""
+def process_transcripts(video_id, source_lang, target_lang, max_time=60, min_duration=2.0, document_keywords=False):
+    """Process and highlight keywords in two transcripts. Returns a dictionary of matched word pairs.
+
+    With document_keywords=True, keywords are scored once over the whole source
+    transcript instead of segment by segment.
+    """
     try:
         # Get transcripts
-        transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
+        with stage('upstream_list'):
+            transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
         source_transcript = transcript_list.find_transcript([source_lang])
         target_transcript = transcript_list.find_transcript([target_lang])
         
-        source_data = source_transcript.fetch()
-        target_data = target_transcript.fetch()
+        with stage('upstream_fetch'):
+            source_data = CompactTranscript.from_segments(source_transcript.fetch())
+            target_data = CompactTranscript.from_segments(target_transcript.fetch())
         
-        # Filter segments by time and duration
-        source_data = [seg for seg in source_data 
-                      if seg['start'] <= max_time and seg['duration'] >= min_duration]
-        target_data = [seg for seg in target_data 
-                      if seg['start'] <= max_time and seg['duration'] >= min_duration]
+        # Filter segments by time and duration (a bisect plus one vectorized comparison);
+        # only the kept segments are turned back into dicts for alignment
+        source_data = source_data.filter(max_time=max_time, min_duration=min_duration).to_segments()
+        target_data = target_data.filter(max_time=max_time, min_duration=min_duration).to_segments()
         
-        # Initialize translator
-        translator = FastM2MTranslator()
+        # The process-wide translator: loaded once, not on every call
+        translator = translator_registry.get()
         
         # Dictionary to store matched word pairs
         matched_words = {
@@ -125,48 +242,119 @@ def process_transcripts(video_id, source_lang, target_lang, max_time=60, min_dur
             'highlighted_phrases': [] # List of tuples (source_phrase, target_phrase)
         }
         
-        print(f"\nProcessing transcripts for languages: {source_lang} -> {target_lang}")
-        
-        for source_segment in source_data:
-            # Find matching segment in target language
-            target_segment = find_matching_segment(source_segment, target_data)
-            
-            if not target_segment:
-                continue
-            
-            # Clean and extract keywords from source text
-            source_text = source_segment['text']
-            cleaned_text = clean_caption_text(source_text)
-            if cleaned_text:
-                keywords = extract_keywords(cleaned_text, source_lang)
-                
-                if keywords:
-                    keyword = keywords[0]
-                    # First verify keyword exists in source text
-                    source_text, source_found = highlight_text(source_text, keyword)
-                    if source_found:
-                        # Translate the keyword
-                        translated_keyword = translator.translate_keyword(keyword, source_lang, target_lang)
-                        translated_keyword = translated_keyword.strip().lower()
-                        
-                        # Try to highlight in target text
-                        target_text, target_found = highlight_text(target_segment['text'], translated_keyword)
-                        if target_found:
-                            matched_words['source_to_target'][keyword] = translated_keyword
-                            matched_words['highlighted_phrases'].append((source_text, target_text))
-
-        # Print only the final highlighted phrases
-        print("\n=== Successfully Highlighted Phrases ===")
-        for i, (source, target) in enumerate(matched_words['highlighted_phrases'], 1):
-            print(f"\n{i}. Source: {source}")
-            print(f"   Target: {target}")
+        logger.debug("highlight.process video_id=%s source=%s target=%s", video_id, source_lang, target_lang)
         
+        # First pass: pick one keyword per aligned segment pair
+        with stage('alignment'):
+            alignment = align_segments(source_data, target_data)
+        pairs = [(source_segment, target_data[target_index])
+                 for source_segment, target_index in zip(source_data, alignment)
+                 if target_index is not None]
+        segment_keywords = extract_segment_keywords(
+            [clean_caption_text(source_segment['text']) for source_segment, _ in pairs],
+            source_lang,
+            document_level=document_keywords,
+        )
+
+        candidates = []
+        for (source_segment, target_segment), keywords in zip(pairs, segment_keywords):
+            if keywords:
+                keyword = keywords[0]
+                # First verify keyword exists in source text
+                source_text, source_found = highlight_text(source_segment['text'], keyword)
+                if source_found:
+                    candidates.append((keyword, source_text, target_segment))
+
+        # Translate all keywords in a few batched generate calls
+        translations = translator.translate_batch(
+            [(keyword, source_lang, target_lang) for keyword, _, _ in candidates],
+            profile='keyword',
+        )
+
+        # Second pass: try to highlight the translated keywords in the target text
+        for (keyword, source_text, target_segment), translated_keyword in zip(candidates, translations):
+            translated_keyword = translated_keyword.strip().lower()
+            target_text, target_found = highlight_text(target_segment['text'], translated_keyword)
+            if target_found:
+                matched_words['source_to_target'][keyword] = translated_keyword
+                matched_words['highlighted_phrases'].append((source_text, target_text))
+
+        logger.debug("highlight.done video_id=%s phrases=%d", video_id, len(matched_words['highlighted_phrases']))
         return matched_words
         
-    except Exception as e:
-        print(f"Error processing transcripts: {str(e)}")
+    except Exception:
+        logger.exception("highlight.process_failed video_id=%s source=%s target=%s", video_id, source_lang, target_lang)
         return None
 
+def highlight_segments(source_data, target_data_by_lang, source_lang, translator,
+                       indices=None, document_level=True, min_length=3):
+    """Compute keywords and match spans for a whole transcript (or a window of it) in one go.
+
+    Returns one entry per requested source segment index with the source
+    keywords, their spans in the source text and, for every target language
+    the model supports, the aligned target segment index with the translated
+    keywords and their spans. Spans are (start, end) code point offsets into the original text;
+    no markup is applied.
+    """
+    if indices is None:
+        indices = range(len(source_data))
+    elif isinstance(indices, range) and indices.step == 1:
+        # Clamp before iterating, so a huge range costs nothing
+        indices = range(max(indices.start, 0), min(indices.stop, len(source_data)))
+    indices = [i for i in indices if 0 <= i < len(source_data)]
+    cleaned = [clean_caption_text(segment['text']) for segment in source_data]
+    segment_keywords = extract_segment_keywords(
+        [cleaned[i] for i in indices],
+        source_lang,
+        min_length=min_length,
+        document_level=document_level,
+        document_texts=cleaned,
+    )
+
+    # Each segment is scanned once with a pattern of its own keywords; a window-wide
+    # pattern would let another segment's longer keyword hide one of these
+    entries = []
+    for i, keywords in zip(indices, segment_keywords):
+        matches = keyword_matcher(tuple(sorted(keywords))).matches(source_data[i]['text']) if keywords else []
+        found = {keyword.lower() for _, _, keyword in matches}
+        entries.append({
+            'index': i,
+            'start': source_data[i]['start'],
+            'keywords': [keyword for keyword in keywords if keyword.lower() in found],
+            'spans': [(start, end) for start, end, _ in matches],
+            'translations': {},
+        })
+
+    window = [source_data[i] for i in indices]
+    # YouTube codes (e.g. 'zh-Hans', 'pt-BR') map to the model's; languages it lacks get no translations
+    model_source = model_language(source_lang)
+    for target_lang, target_data in target_data_by_lang.items():
+        model_target = model_language(target_lang)
+        if model_source is None or model_target is None:
+            continue
+        with stage('alignment'):
+            alignment = align_segments(window, target_data)
+        pending = [(entry, target_index) for entry, target_index in zip(entries, alignment)
+                   if target_index is not None and entry['keywords']]
+        translations = translator.translate_batch(
+            [(keyword, model_source, model_target) for entry, _ in pending for keyword in entry['keywords']],
+            profile='keyword',
+        )
+
+        translations = [translation.strip().lower() for translation in translations]
+        position = 0
+        for entry, target_index in pending:
+            translated = translations[position:position + len(entry['keywords'])]
+            position += len(entry['keywords'])
+            spans = keyword_matcher(tuple(sorted(translated))).spans(target_data[target_index]['text'])
+            entry['translations'][target_lang] = {
+                'index': target_index,
+                'keywords': translated,
+                'spans': spans,
+            }
+
+    return entries
+
 def main():
     # Example video ID (replace with your video ID)
     video_id = "zy2Zj8yIe6c"
@@ -196,6 +384,11 @@ def main():
         )
         word_pairs = []
         if matched_words:
+            print("\n=== Successfully Highlighted Phrases ===")
+            for i, (source, target) in enumerate(matched_words['highlighted_phrases'], 1):
+                print(f"\n{i}. Source: {source}")
+                print(f"   Target: {target}")
+
             print("\n=== Matched Word Pairs ===")
             for source_word, target_word in matched_words['source_to_target'].items():
                 print(f"'{source_word}' -> '{target_word}'")
@@ -207,4 +400,5 @@ def main():
         print(f"Error: {str(e)}")
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s %(message)s')
     main() 
\ No newline at end of file
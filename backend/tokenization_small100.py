@@ -17,11 +17,17 @@
 # limitations under the License.
 """Tokenization classes for SMALL100."""
 import json
+import mmap
 import os
+import struct
+from collections import ChainMap
+from collections.abc import Mapping
+from itertools import chain
 from pathlib import Path
 from shutil import copyfile
 from typing import Any, Dict, List, Optional, Tuple, Union
 
+import numpy as np
 import sentencepiece
 
 from transformers.tokenization_utils import BatchEncoding, PreTrainedTokenizer
@@ -36,6 +42,7 @@ VOCAB_FILES_NAMES = {
     "vocab_file": "vocab.json",
     "spm_file": "sentencepiece.bpe.model",
     "tokenizer_config_file": "tokenizer_config.json",
+    "compiled_vocab_file": "vocab.idx",
 }
 
 PRETRAINED_VOCAB_FILES_MAP = {
@@ -69,6 +76,9 @@ class SMALL100Tokenizer(PreTrainedTokenizer):
     Args:
         vocab_file (`str`):
             Path to the vocabulary file.
+        compiled_vocab_file (`str`, *optional*):
+            Path to a compiled vocabulary written by `save_vocabulary`. When present it is memory-mapped and used
+            instead of `vocab_file`, which avoids parsing the JSON vocabulary and building the reverse mapping.
         spm_file (`str`):
             Path to [SentencePiece](https://github.com/google/sentencepiece) file (generally has a .spm extension) that
             contains the vocabulary.
@@ -130,6 +140,7 @@ class SMALL100Tokenizer(PreTrainedTokenizer):
         language_codes="m2m100",
         sp_model_kwargs: Optional[Dict[str, Any]] = None,
         num_madeup_words=8,
+        compiled_vocab_file=None,
         **kwargs,
     ) -> None:
         self.sp_model_kwargs = {} if sp_model_kwargs is None else sp_model_kwargs
@@ -146,10 +157,17 @@ class SMALL100Tokenizer(PreTrainedTokenizer):
         ]
 
         self.vocab_file = vocab_file
-        self.encoder = load_json(vocab_file)
-        self.decoder = {v: k for k, v in self.encoder.items()}
         self.spm_file = spm_file
         self.sp_model = load_spm(spm_file, self.sp_model_kwargs)
+        self.encoder = None
+        if compiled_vocab_file is not None and os.path.isfile(compiled_vocab_file):
+            self.encoder = CompiledVocab(compiled_vocab_file)
+            if self.encoder.sp_to_model is not None and len(self.encoder.sp_to_model) != self.sp_model.get_piece_size():
+                logger.warning(f"{compiled_vocab_file} does not match {spm_file}, falling back to {vocab_file}")
+                self.encoder = None
+        if self.encoder is None:
+            self.encoder = load_json(vocab_file)
+        self._decoder = None
 
         self.encoder_size = len(self.encoder)
 
@@ -162,6 +180,8 @@ class SMALL100Tokenizer(PreTrainedTokenizer):
         self._tgt_lang = tgt_lang if tgt_lang is not None else "en"
         self.cur_lang_id = self.get_lang_id(self._tgt_lang)
         self.num_madeup_words = num_madeup_words
+        self._lang_special_tokens = {}
+        self._id_remap = None
         
         super().__init__(
             tgt_lang=tgt_lang,
@@ -179,6 +199,16 @@ class SMALL100Tokenizer(PreTrainedTokenizer):
         self.set_lang_special_tokens(self._tgt_lang)
 
 
+    @property
+    def decoder(self) -> Mapping:
+        """Reverse vocabulary (id -> token), built on first use."""
+        if self._decoder is None:
+            if isinstance(self.encoder, CompiledVocab):
+                self._decoder = self.encoder.inverse()
+            else:
+                self._decoder = {v: k for k, v in self.encoder.items()}
+        return self._decoder
+
     @property
     def vocab_size(self) -> int:
         return len(self.encoder) + len(self.lang_token_to_id) + self.num_madeup_words
@@ -268,8 +298,20 @@ class SMALL100Tokenizer(PreTrainedTokenizer):
             return self.prefix_tokens + token_ids_0 + token_ids_1 + self.suffix_tokens
 
     def get_vocab(self) -> Dict:
-        vocab = {self.convert_ids_to_tokens(i): i for i in range(self.vocab_size)}
-        vocab.update(self.added_tokens_encoder)
+        # Same mapping as {self.convert_ids_to_tokens(i): i for i in range(self.vocab_size)} plus the added tokens,
+        # without converting every id one at a time: base vocabulary, then language tokens, then the made-up
+        # words (which all convert to the unk token, so the last one wins), then tokens added on top.
+        overrides = dict(self.lang_token_to_id)
+        if self.num_madeup_words:
+            overrides[self.unk_token] = self.vocab_size - 1
+        for index, token in self._added_tokens_decoder.items():
+            if index < self.vocab_size:
+                overrides[str(token)] = index
+        overrides.update(self.added_tokens_encoder)
+        if isinstance(self.encoder, CompiledVocab):
+            return _VocabOverlay(overrides, self.encoder)
+        vocab = dict(self.encoder)
+        vocab.update(overrides)
         return vocab
 
     def __getstate__(self) -> Dict:
@@ -283,6 +325,12 @@ class SMALL100Tokenizer(PreTrainedTokenizer):
         # for backward compatibility
         if not hasattr(self, "sp_model_kwargs"):
             self.sp_model_kwargs = {}
+        if not hasattr(self, "_lang_special_tokens"):
+            self._lang_special_tokens = {}
+        if not hasattr(self, "_id_remap"):
+            self._id_remap = None
+        if "decoder" in self.__dict__:
+            self._decoder = self.__dict__.pop("decoder")
 
         self.sp_model = load_spm(self.spm_file, self.sp_model_kwargs)
 
@@ -297,7 +345,12 @@ class SMALL100Tokenizer(PreTrainedTokenizer):
             (filename_prefix + "-" if filename_prefix else "") + self.vocab_files_names["spm_file"]
         )
 
-        save_json(self.encoder, vocab_save_path)
+        compiled_save_path = save_dir / (
+            (filename_prefix + "-" if filename_prefix else "") + self.vocab_files_names["compiled_vocab_file"]
+        )
+
+        save_json(dict(self.encoder), vocab_save_path)
+        save_compiled_vocab(self.encoder, self._get_id_remap()[0], compiled_save_path)
 
         if os.path.abspath(self.spm_file) != os.path.abspath(spm_save_path) and os.path.isfile(self.spm_file):
             copyfile(self.spm_file, spm_save_path)
@@ -306,7 +359,7 @@ class SMALL100Tokenizer(PreTrainedTokenizer):
                 content_spiece_model = self.sp_model.serialized_model_proto()
                 fi.write(content_spiece_model)
 
-        return (str(vocab_save_path), str(spm_save_path))
+        return (str(vocab_save_path), str(spm_save_path), str(compiled_save_path))
 
     def prepare_seq2seq_batch(
         self,
@@ -327,6 +380,136 @@ class SMALL100Tokenizer(PreTrainedTokenizer):
         inputs = self(raw_inputs, add_special_tokens=True, **extra_kwargs)
         return inputs
 
+    def encode_for_target(
+        self,
+        text: Union[str, List[str]],
+        tgt_lang: str,
+        padding: Union[bool, str] = True,
+        return_tensors: Optional[str] = None,
+    ) -> BatchEncoding:
+        """
+        Encode source text(s) for translation into `tgt_lang` without touching the tokenizer state.
+        Setting `tgt_lang` rewrites `prefix_tokens`/`suffix_tokens` on the instance, which races when one
+        tokenizer is shared between threads. This path takes the target language as an argument instead, so a
+        single loaded tokenizer can serve concurrent requests.
+        Args:
+            text (`str` or `List[str]`):
+                The sequence or batch of sequences to encode.
+            tgt_lang (`str`):
+                The target language code, e.g. `"fr"`.
+            padding (`bool` or `str`, *optional*, defaults to `True`):
+                Passed to [`~PreTrainedTokenizer.pad`].
+            return_tensors (`str`, *optional*):
+                Passed to [`~PreTrainedTokenizer.pad`].
+        Returns:
+            [`BatchEncoding`] with `input_ids` and `attention_mask`.
+        """
+        is_batched = not isinstance(text, str)
+        input_ids = self.encode_many(list(text) if is_batched else [text], tgt_lang=tgt_lang)
+        encoded = {"input_ids": input_ids if is_batched else input_ids[0]}
+        return self.pad(encoded, padding=padding, return_tensors=return_tensors)
+
+    def _get_id_remap(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Lazily build the lookup arrays used by `encode_many`/`decode_many`: sentencepiece id -> model id,
+        model id -> sentencepiece id (-1 where the model token has no piece) and a mask of special model ids.
+        """
+        if self._id_remap is None:
+            unk_id = self.encoder[self.unk_token]
+            if isinstance(self.encoder, CompiledVocab) and self.encoder.sp_to_model is not None:
+                sp_to_model = self.encoder.sp_to_model
+            else:
+                pieces = self.sp_model.id_to_piece(list(range(self.sp_model.get_piece_size())))
+                sp_to_model = np.fromiter(
+                    (self.encoder.get(p, unk_id) for p in pieces), dtype=np.int64, count=len(pieces)
+                )
+
+            model_to_sp = np.full(self.vocab_size, -1, dtype=np.int64)
+            known = sp_to_model != unk_id
+            model_to_sp[sp_to_model[known]] = np.flatnonzero(known)
+            model_to_sp[unk_id] = self.sp_model.unk_id()
+
+            # `decode` skips by token string, so every id that converts to a special token counts: the special
+            # tokens themselves, the language codes and the made-up words (which convert to the unk token)
+            special = np.zeros(self.vocab_size, dtype=bool)
+            special[[self.encoder[t] for t in self.all_special_tokens if t in self.encoder]] = True
+            special[[i for i in self.all_special_ids if i < self.vocab_size]] = True
+            special[self.encoder_size:] = True
+            self._id_remap = (sp_to_model, model_to_sp, special)
+        return self._id_remap
+
+    def encode_many(
+        self, texts: List[str], tgt_lang: Optional[str] = None, add_special_tokens: bool = True
+    ) -> List[List[int]]:
+        """
+        Encode a batch of texts to model ids in one sentencepiece call, mapping the piece ids through a
+        precomputed array instead of converting token strings one at a time. Special-token strings inside the
+        texts are not recognised, which is fine for caption text.
+        Args:
+            texts (`List[str]`):
+                The sequences to encode.
+            tgt_lang (`str`, *optional*):
+                Target language for the special tokens, defaults to the current `tgt_lang`.
+            add_special_tokens (`bool`, *optional*, defaults to `True`):
+                Whether to add the `[tgt_lang_code] X [eos]` special tokens.
+        Returns:
+            `List[List[int]]`: The model input ids of every text.
+        """
+        sp_to_model = self._get_id_remap()[0]
+        pieces = self.sp_model.encode(list(texts))
+        lengths = [len(p) for p in pieces]
+        flat = np.fromiter(chain.from_iterable(pieces), dtype=np.int64, count=sum(lengths))
+        ids = sp_to_model[flat].tolist()
+
+        prefix, suffix = self.get_lang_special_tokens(tgt_lang or self.tgt_lang) if add_special_tokens else ((), ())
+        prefix, suffix = list(prefix), list(suffix)
+        result = []
+        offset = 0
+        for length in lengths:
+            result.append(prefix + ids[offset:offset + length] + suffix)
+            offset += length
+        return result
+
+    def decode_many(self, sequences, skip_special_tokens: bool = True) -> List[str]:
+        """
+        Decode a batch of model id sequences (lists, a NumPy array or a tensor) in one sentencepiece call.
+        Sequences that contain tokens sentencepiece does not know (language codes, made-up words) while
+        `skip_special_tokens=False` fall back to the regular `decode`.
+        """
+        _, model_to_sp, special = self._get_id_remap()
+        if hasattr(sequences, "detach"):
+            sequences = sequences.detach().cpu().numpy()
+
+        sp_ids = []
+        fallback = {}
+        for i, seq in enumerate(sequences):
+            seq = np.asarray(seq, dtype=np.int64)
+            in_range = seq < len(model_to_sp)
+            clipped = np.where(in_range, seq, 0)
+            if skip_special_tokens:
+                seq = seq[~(special[clipped] & in_range)]
+                in_range = seq < len(model_to_sp)
+                clipped = np.where(in_range, seq, 0)
+            mapped = np.where(in_range, model_to_sp[clipped], -1)
+            if (mapped < 0).any():
+                fallback[i] = seq.tolist()
+            sp_ids.append(mapped[mapped >= 0].tolist())
+
+        texts = self.sp_model.decode(sp_ids)
+        if self.clean_up_tokenization_spaces:
+            texts = [self.clean_up_tokenization(text) for text in texts]
+        for i, seq in fallback.items():
+            texts[i] = self.decode(seq, skip_special_tokens=skip_special_tokens)
+        return texts
+
+    def get_lang_special_tokens(self, tgt_lang: str) -> Tuple[Tuple[int, ...], Tuple[int, ...]]:
+        """Return the (prefix, suffix) special tokens for a target language, cached per language."""
+        tokens = self._lang_special_tokens.get(tgt_lang)
+        if tokens is None:
+            tokens = ((self.get_lang_id(tgt_lang),), (self.eos_token_id,))
+            self._lang_special_tokens[tgt_lang] = tokens
+        return tokens
+
     def _switch_to_input_mode(self):
         self.set_lang_special_tokens(self.tgt_lang)
 
@@ -362,4 +545,141 @@ def load_json(path: str) -> Union[Dict, List]:
 
 def save_json(data, path: str) -> None:
     with open(path, "w") as f:
-        json.dump(data, f, indent=2)
\ No newline at end of file
+        json.dump(data, f, indent=2)
+
+COMPILED_VOCAB_MAGIC = b"S100VOC1"
+
+
+class CompiledVocab(Mapping):
+    """
+    Read-only token -> id mapping backed by a memory-mapped file written by `save_compiled_vocab`.
+    The file holds the tokens as one UTF-8 blob sorted bytewise, with offset, id and id -> position arrays, plus
+    the sentencepiece id -> model id remap. Nothing is parsed up front: lookups binary-search the mapped pages, so
+    worker processes share the same physical memory.
+    """
+
+    def __init__(self, path: str):
+        self.path = str(path)
+        with open(self.path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[: len(COMPILED_VOCAB_MAGIC)] != COMPILED_VOCAB_MAGIC:
+            raise ValueError(f"{self.path} is not a compiled SMALL100 vocabulary")
+        header_size = struct.unpack_from("<I", self._mm, len(COMPILED_VOCAB_MAGIC))[0]
+        start = len(COMPILED_VOCAB_MAGIC) + 4
+        header = json.loads(self._mm[start : start + header_size])
+        sections = header["sections"]
+        view = memoryview(self._mm)
+
+        self._count = header["count"]
+        self._offsets = view[sections["offsets"][0] : sections["offsets"][1]].cast("q")
+        self._ids = view[sections["ids"][0] : sections["ids"][1]].cast("i")
+        self._positions = view[sections["positions"][0] : sections["positions"][1]].cast("i")
+        self._blob_start = sections["blob"][0]
+        sp_start, sp_end = sections["sp_to_model"]
+        self.sp_to_model = np.frombuffer(self._mm, dtype="<i8", count=(sp_end - sp_start) // 8, offset=sp_start)
+        if not len(self.sp_to_model):
+            self.sp_to_model = None
+
+    def __reduce__(self):
+        return (CompiledVocab, (self.path,))
+
+    def _token_bytes(self, position: int) -> bytes:
+        return self._mm[self._blob_start + self._offsets[position] : self._blob_start + self._offsets[position + 1]]
+
+    def __getitem__(self, token: str) -> int:
+        key = token.encode("utf-8")
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._token_bytes(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self._count and self._token_bytes(lo) == key:
+            return self._ids[lo]
+        raise KeyError(token)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self):
+        for position in range(self._count):
+            yield self._token_bytes(position).decode("utf-8")
+
+    def items(self):
+        for position in range(self._count):
+            yield self._token_bytes(position).decode("utf-8"), self._ids[position]
+
+    def token(self, index: int) -> Optional[str]:
+        """Return the token with the given id, or None."""
+        if 0 <= index < len(self._positions):
+            position = self._positions[index]
+            if position >= 0:
+                return self._token_bytes(position).decode("utf-8")
+        return None
+
+    def inverse(self) -> "_CompiledDecoder":
+        return _CompiledDecoder(self)
+
+
+class _CompiledDecoder(Mapping):
+    """id -> token view of a `CompiledVocab`."""
+
+    def __init__(self, vocab: CompiledVocab):
+        self.vocab = vocab
+
+    def __getitem__(self, index: int) -> str:
+        token = self.vocab.token(index)
+        if token is None:
+            raise KeyError(index)
+        return token
+
+    def __len__(self) -> int:
+        return len(self.vocab)
+
+    def __iter__(self):
+        for _, index in self.vocab.items():
+            yield index
+
+
+class _VocabOverlay(ChainMap):
+    """`get_vocab` result over a `CompiledVocab` that can be sized and copied without materialising the base."""
+
+    def __len__(self) -> int:
+        base = self.maps[-1]
+        extra = set().union(*self.maps[:-1])
+        return len(base) + sum(1 for token in extra if token not in base)
+
+
+def save_compiled_vocab(vocab: Mapping, sp_to_model: Optional[np.ndarray], path: str) -> None:
+    """Write `vocab` (token -> id) in the memory-mappable format read by `CompiledVocab`."""
+    entries = sorted((token.encode("utf-8"), index) for token, index in vocab.items())
+    blob = b"".join(token for token, _ in entries)
+    offsets = np.zeros(len(entries) + 1, dtype="<i8")
+    np.cumsum([len(token) for token, _ in entries], out=offsets[1:])
+    ids = np.array([index for _, index in entries], dtype="<i4")
+    positions = np.full(int(ids.max()) + 1 if len(ids) else 0, -1, dtype="<i4")
+    positions[ids] = np.arange(len(ids), dtype="<i4")
+    sp_array = np.asarray(sp_to_model if sp_to_model is not None else [], dtype="<i8")
+
+    parts = [("offsets", offsets.tobytes()), ("ids", ids.tobytes()), ("positions", positions.tobytes()),
+             ("sp_to_model", sp_array.tobytes()), ("blob", blob)]
+    # The header stores absolute section offsets, which depend on the header's own length: iterate until stable
+    header = {"count": len(entries), "sections": {}}
+    header_bytes = b""
+    while True:
+        position = len(COMPILED_VOCAB_MAGIC) + 4 + len(header_bytes)
+        for name, data in parts:
+            position += -position % 8
+            header["sections"][name] = [position, position + len(data)]
+            position += len(data)
+        encoded = json.dumps(header).encode("utf-8")
+        if encoded == header_bytes:
+            break
+        header_bytes = encoded
+
+    with open(path, "wb") as f:
+        f.write(COMPILED_VOCAB_MAGIC + struct.pack("<I", len(header_bytes)) + header_bytes)
+        for name, data in parts:
+            f.write(b"\0" * (header["sections"][name][0] - f.tell()))
+            f.write(data)
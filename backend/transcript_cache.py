@@ -0,0 +1,129 @@
+"""Process-wide cache of YouTube transcript listings, keyed by video ID"""
+import threading
+import time
+from collections import OrderedDict
+
+
+def estimate_listing_size(transcript_list):
+    """Rough byte estimate of a TranscriptList, used to enforce the memory cap."""
+    size = 512
+    for transcript in transcript_list:
+        size += 256 + 64 * len(transcript.translation_languages)
+    return size
+
+
+class _PendingLoad:
+    """A listing that is currently being fetched upstream by another thread."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TranscriptListCache:
+    """
+    LRU cache with a TTL and an approximate memory cap.
+
+    Concurrent misses for the same key are coalesced: the first caller runs the
+    loader, everyone else waits for its result (or its exception).
+    """
+
+    def __init__(self, loader, ttl=300.0, max_entries=1024, max_bytes=32 * 1024 * 1024,
+                 sizeof=estimate_listing_size, clock=time.monotonic):
+        self.loader = loader
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.clock = clock
+
+        self._entries = OrderedDict()  # key -> (expires_at, size, value)
+        self._pending = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return the cached value for key, loading it upstream on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > self.clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[2]
+                self._remove(key)
+
+            pending = self._pending.get(key)
+            owner = pending is None
+            if owner:
+                self.misses += 1
+                pending = self._pending[key] = _PendingLoad()
+            else:
+                self.coalesced += 1
+
+        if not owner:
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.value
+
+        try:
+            pending.value = self.loader(key)
+        except BaseException as e:
+            pending.error = e
+            raise
+        else:
+            self._store(key, pending.value)
+            return pending.value
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+            pending.done.set()
+
+    def invalidate(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Counters for monitoring, safe to serialize as JSON."""
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'evictions': self.evictions,
+                'hit_rate': (self.hits + self.coalesced) / lookups if lookups else 0.0,
+            }
+
+    def _store(self, key, value):
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (self.clock() + self.ttl, size, value)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
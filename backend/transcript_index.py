@@ -0,0 +1,62 @@
+"""Start-time index over a transcript, for serving caption windows instead of whole transcripts"""
+import numpy as np
+
+from compact_transcript import CompactTranscript
+
+
+class TranscriptIndex:
+    """
+    Sorted start times of a transcript's segments.
+
+    range(start_time, end_time) finds the segments overlapping a window in
+    O(log n + k): bisect finds the first segment that could still be showing at
+    start_time (no segment is longer than max_duration), then the slice ends at
+    the first segment starting at or after end_time.
+    """
+
+    def __init__(self, segments):
+        # YouTube transcripts are ordered by start time already; sort defensively
+        if any(a['start'] > b['start'] for a, b in zip(segments, segments[1:])):
+            segments = sorted(segments, key=lambda segment: segment['start'])
+        self.segments = CompactTranscript.from_segments(segments)
+        self.starts = self.segments.starts
+        self.ends = self.starts + self.segments.durations
+        self.max_duration = float(self.segments.durations.max()) if len(self.segments) else 0.0
+
+    def __len__(self):
+        return len(self.segments)
+
+    def range(self, start_time=None, end_time=None):
+        """
+        Return (lo, hi) so that segments[lo:hi] covers every segment overlapping [start_time, end_time).
+
+        lo is the first overlapping segment; with overlapping captions the slice
+        can also contain a few later segments that already ended before start_time.
+        """
+        lo = 0
+        if start_time is not None:
+            lo = int(np.searchsorted(self.starts, start_time - self.max_duration))
+            while lo < len(self.segments) and self.ends[lo] <= start_time:
+                lo += 1
+        hi = len(self.segments) if end_time is None else int(np.searchsorted(self.starts, end_time))
+        return lo, max(lo, hi)
+
+    def page(self, start_time=None, end_time=None, cursor=None, limit=None):
+        """
+        Return (start_index, segments, next_cursor) for a time window and/or index cursor.
+
+        segments is a zero-copy CompactTranscript view.
+
+        cursor is a segment index to resume from; next_cursor is None once the
+        window is exhausted.
+        """
+        lo, hi = self.range(start_time, end_time)
+        if cursor is not None:
+            lo = min(max(lo, cursor), hi)
+        stop = hi if limit is None else min(hi, lo + limit)
+        return lo, self.segments[lo:stop], (stop if stop < hi else None)
+
+
+def estimate_index_size(index):
+    """Rough byte estimate of an indexed transcript, used for the index cache memory cap."""
+    return 256 + index.segments.nbytes + index.ends.nbytes
@@ -0,0 +1,166 @@
+"""
+Where transcript listings come from: YouTube, or a local fake for load tests
+
+    TRANSCRIPT_SOURCE=fake python app.py
+
+The fake source builds real TranscriptList/Transcript objects, so every route
+runs unchanged, but their contents are synthetic and fetch()/translate() never
+touch the network. Each video's languages, transcript length and whether its
+transcripts are disabled are derived from the video ID, so repeated requests
+see the same video; latency is random. Tune it with the FAKE_TRANSCRIPT_*
+variables read by source_from_env().
+"""
+import os
+import random
+import threading
+import time
+import zlib
+
+from youtube_transcript_api import (TooManyRequests, Transcript, TranscriptList, TranscriptsDisabled,
+                                    YouTubeTranscriptApi)
+
+LANGUAGE_NAMES = {
+    'en': 'English', 'es': 'Spanish', 'fr': 'French', 'de': 'German', 'it': 'Italian', 'pt': 'Portuguese',
+    'ja': 'Japanese', 'ko': 'Korean', 'zh-Hans': 'Chinese (Simplified)', 'ru': 'Russian', 'ar': 'Arabic',
+    'hi': 'Hindi',
+}
+
+_WORDS = (
+    "the people time year way day thing world life hand part child eye woman place work week case point "
+    "number group problem fact music science history ocean mountain engine language river computer garden "
+    "make know think take see come want look use find give tell work call try feel leave good new first "
+    "long great little own other old right big high different small large next early young important"
+).split()
+
+
+class YouTubeSource:
+    """The real upstream."""
+
+    name = 'youtube'
+
+    def list_transcripts(self, video_id):
+        return YouTubeTranscriptApi.list_transcripts(video_id)
+
+    def stats(self):
+        return {'source': self.name}
+
+
+class _FakeTranscript(Transcript):
+    def __init__(self, source, video_id, language_code, is_generated, translation_languages, translated_from=None):
+        super().__init__(None, video_id, None, LANGUAGE_NAMES.get(language_code, language_code), language_code,
+                         is_generated, translation_languages)
+        self._source = source
+        self._translated_from = translated_from
+
+    def fetch(self, preserve_formatting=False):
+        return self._source.fetch(self.video_id, self.language_code, self._translated_from)
+
+    def translate(self, language_code):
+        # Same checks as the real Transcript.translate, which would build an HTTP-backed Transcript
+        if language_code not in self._translation_languages_dict:
+            super().translate(language_code)
+        self._source.count('translate')
+        return _FakeTranscript(self._source, self.video_id, language_code, True, [],
+                               translated_from=self.language_code)
+
+
+class FakeSource:
+    """
+    Synthetic transcript upstream for load tests.
+
+    disabled_rate of videos raise TranscriptsDisabled when listed, and each
+    language beyond the first is missing (NoTranscriptFound, unless
+    translated) with probability not_found_rate. Listing and fetching sleep
+    for list_latency/fetch_latency seconds, +-50%, and fetch_error_rate of
+    fetches fail with TooManyRequests, like a throttling upstream.
+    """
+
+    name = 'fake'
+
+    def __init__(self, languages=('en', 'es', 'fr', 'de', 'ja'), min_segments=200, max_segments=1500,
+                 list_latency=0.2, fetch_latency=0.3, disabled_rate=0.02, not_found_rate=0.3,
+                 fetch_error_rate=0.0, seed=0):
+        self.languages = tuple(languages)
+        self.min_segments = min_segments
+        self.max_segments = max_segments
+        self.list_latency = list_latency
+        self.fetch_latency = fetch_latency
+        self.disabled_rate = disabled_rate
+        self.not_found_rate = not_found_rate
+        self.fetch_error_rate = fetch_error_rate
+        self.seed = seed
+        self._lock = threading.Lock()
+        self._counts = {'list': 0, 'fetch': 0, 'translate': 0, 'errors': 0}
+
+    def _random(self, *key):
+        # Stable per video (and language) across calls and processes, unlike hash()
+        return random.Random(zlib.crc32(':'.join(map(str, (self.seed,) + key)).encode('utf-8')))
+
+    def count(self, name):
+        with self._lock:
+            self._counts[name] += 1
+
+    def _sleep(self, latency):
+        if latency > 0:
+            time.sleep(latency * random.uniform(0.5, 1.5))
+
+    def list_transcripts(self, video_id):
+        self.count('list')
+        self._sleep(self.list_latency)
+        rng = self._random(video_id)
+        if rng.random() < self.disabled_rate:
+            self.count('errors')
+            raise TranscriptsDisabled(video_id)
+
+        available = [self.languages[0]] + [lang for lang in self.languages[1:] if rng.random() >= self.not_found_rate]
+        translation_languages = [{'language': LANGUAGE_NAMES.get(lang, lang), 'language_code': lang}
+                                 for lang in LANGUAGE_NAMES]
+        manual, generated = {}, {}
+        for lang in available:
+            is_generated = rng.random() < 0.5
+            (generated if is_generated else manual)[lang] = _FakeTranscript(
+                self, video_id, lang, is_generated, translation_languages)
+        return TranscriptList(video_id, manual, generated, translation_languages)
+
+    def fetch(self, video_id, language_code, translated_from=None):
+        self.count('fetch')
+        self._sleep(self.fetch_latency)
+        if self.fetch_error_rate and random.random() < self.fetch_error_rate:
+            self.count('errors')
+            raise TooManyRequests(video_id)
+
+        # Timings come from the video, so every language of it lines up like real captions
+        timing = self._random(video_id, 'timing')
+        words = self._random(video_id, language_code, translated_from)
+        segments = []
+        start = 0.0
+        for _ in range(timing.randint(self.min_segments, self.max_segments)):
+            duration = round(timing.uniform(1.0, 6.0), 3)
+            text = ' '.join(words.choices(_WORDS, k=words.randint(4, 12)))
+            segments.append({'text': text, 'start': round(start, 3), 'duration': duration})
+            start += duration * timing.uniform(0.7, 1.05)
+        return segments
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counts, source=self.name)
+
+
+def source_from_env(environ=os.environ):
+    """Build the transcript source selected by TRANSCRIPT_SOURCE (youtube or fake)."""
+    name = environ.get('TRANSCRIPT_SOURCE', 'youtube')
+    if name == 'youtube':
+        return YouTubeSource()
+    if name == 'fake':
+        return FakeSource(
+            languages=environ.get('FAKE_TRANSCRIPT_LANGUAGES', 'en,es,fr,de,ja').split(','),
+            min_segments=int(environ.get('FAKE_TRANSCRIPT_MIN_SEGMENTS', 200)),
+            max_segments=int(environ.get('FAKE_TRANSCRIPT_MAX_SEGMENTS', 1500)),
+            list_latency=float(environ.get('FAKE_TRANSCRIPT_LIST_LATENCY', 0.2)),
+            fetch_latency=float(environ.get('FAKE_TRANSCRIPT_FETCH_LATENCY', 0.3)),
+            disabled_rate=float(environ.get('FAKE_TRANSCRIPT_DISABLED_RATE', 0.02)),
+            not_found_rate=float(environ.get('FAKE_TRANSCRIPT_NOT_FOUND_RATE', 0.3)),
+            fetch_error_rate=float(environ.get('FAKE_TRANSCRIPT_FETCH_ERROR_RATE', 0.0)),
+            seed=int(environ.get('FAKE_TRANSCRIPT_SEED', 0)),
+        )
+    raise ValueError(f"TRANSCRIPT_SOURCE must be 'youtube' or 'fake', not {name!r}")
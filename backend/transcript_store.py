@@ -0,0 +1,260 @@
+"""Persistent, content-addressed store for fetched and translated transcripts"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    digest TEXT PRIMARY KEY,
+    data BLOB NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS transcripts (
+    video_id TEXT NOT NULL,
+    lang TEXT NOT NULL,
+    is_generated INTEGER NOT NULL,
+    translated_from TEXT NOT NULL DEFAULT '',
+    digest TEXT NOT NULL REFERENCES blobs(digest),
+    last_access REAL NOT NULL,
+    PRIMARY KEY (video_id, lang, is_generated, translated_from)
+);
+CREATE INDEX IF NOT EXISTS transcripts_last_access ON transcripts(last_access);
+CREATE INDEX IF NOT EXISTS transcripts_digest ON transcripts(digest);
+"""
+
+# Direct transcripts win over translations, manually created ones over generated ones
+# (the same preference as TranscriptList.find_transcript)
+PREFERENCE_ORDER = "(translated_from != ''), is_generated"
+
+# What produced a stored translation: translated_from is '<src>' for YouTube's
+# machine translation and '<src>:<model>' for a local model
+TRANSLATOR = ("CASE WHEN instr(t.translated_from, ':') "
+              "THEN substr(t.translated_from, instr(t.translated_from, ':') + 1) ELSE '' END")
+
+
+def encode_segments(segments):
+    """Serialize a transcript to compressed bytes and return (digest, data)."""
+    raw = json.dumps(segments, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return hashlib.sha256(raw).hexdigest(), zlib.compress(raw, 6)
+
+
+def decode_segments(data):
+    return json.loads(zlib.decompress(data))
+
+
+class TranscriptStore:
+    """
+    SQLite-backed transcript store keyed by (video_id, lang, is_generated, translated_from).
+
+    Segment payloads are stored once per content digest, so identical transcripts
+    reachable through several keys share storage. When the total payload size
+    exceeds max_bytes the least recently used keys are evicted. The database
+    survives restarts, so popular videos are served without any upstream call.
+
+    Reads only note their access times in memory; the notes are written in one
+    transaction at most every touch_interval seconds (and before an eviction),
+    so readers do not queue behind each other for the write lock.
+    """
+
+    def __init__(self, path, max_bytes=512 * 1024 * 1024, touch_interval=30.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.touch_interval = touch_interval
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._touches = {}
+        self._touch_lock = threading.Lock()
+        self._touched_at = time.monotonic()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+        self._bytes = self._stored_bytes(self._connect())
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @property
+    def total_bytes(self):
+        return self._bytes
+
+    @staticmethod
+    def _stored_bytes(conn):
+        return conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+
+    def get(self, video_id, lang, is_generated, translated_from=None):
+        """Return the stored segments for an exact key, or None."""
+        found = self.get_many([(video_id, lang, is_generated, translated_from)])
+        return found.get((video_id, lang, bool(is_generated), translated_from or None))
+
+    def get_many(self, keys):
+        """Bulk read: return {key: segments} for every key that is stored."""
+        keys = [(v, l, bool(g), t or None) for v, l, g, t in keys]
+        if not keys:
+            return {}
+        placeholders = ','.join(['(?, ?, ?, ?)'] * len(keys))
+        params = [p for v, l, g, t in keys for p in (v, l, int(g), t or '')]
+        rows = self._connect().execute(
+            "SELECT t.video_id, t.lang, t.is_generated, t.translated_from, b.data "
+            "FROM transcripts t JOIN blobs b ON b.digest = t.digest "
+            f"WHERE (t.video_id, t.lang, t.is_generated, t.translated_from) IN (VALUES {placeholders})",
+            params,
+        ).fetchall()
+        result = {}
+        for video_id, lang, is_generated, translated_from, data in rows:
+            result[(video_id, lang, bool(is_generated), translated_from or None)] = decode_segments(data)
+        self._touch([key for key in result])
+        return result
+
+    def find(self, video_id, lang, translated_from=None, translator=None):
+        """Return the preferred stored transcript for (video_id, lang), or None.
+
+        With translated_from set, only translations from that language match.
+        With translator set, translations only match if that translator produced
+        them ('' for YouTube, a model tag for a local model); transcripts that
+        are not translations always match.
+        """
+        return self.find_many(video_id, [lang], translated_from, translator).get(lang)
+
+    @staticmethod
+    def _filters(translated_from, translator):
+        clauses, params = '', []
+        if translated_from is not None:
+            clauses += " AND t.translated_from = ?"
+            params.append(translated_from)
+        if translator is not None:
+            clauses += f" AND (t.translated_from = '' OR {TRANSLATOR} = ?)"
+            params.append(translator)
+        return clauses, params
+
+    def find_many(self, video_id, langs, translated_from=None, translator=None):
+        """Bulk variant of find(): return {lang: segments} for the stored languages."""
+        langs = list(dict.fromkeys(langs))
+        if not langs:
+            return {}
+        clauses, filter_params = self._filters(translated_from, translator)
+        query = (
+            "SELECT t.lang, t.is_generated, t.translated_from, b.data "
+            "FROM transcripts t JOIN blobs b ON b.digest = t.digest "
+            f"WHERE t.video_id = ? AND t.lang IN ({','.join('?' * len(langs))})"
+            f"{clauses} ORDER BY {PREFERENCE_ORDER}"
+        )
+        params = [video_id, *langs, *filter_params]
+
+        result = {}
+        touched = []
+        for lang, is_generated, source, data in self._connect().execute(query, params):
+            if lang not in result:
+                result[lang] = decode_segments(data)
+                touched.append((video_id, lang, bool(is_generated), source or None))
+        self._touch(touched)
+        return result
+
+    def digest(self, video_id, lang, translated_from=None, translator=None):
+        """Content digest of the preferred stored transcript, usable as an ETag."""
+        clauses, filter_params = self._filters(translated_from, translator)
+        query = f"SELECT digest FROM transcripts t WHERE video_id = ? AND lang = ?{clauses}"
+        params = [video_id, lang, *filter_params]
+        row = self._connect().execute(query + f" ORDER BY {PREFERENCE_ORDER} LIMIT 1", params).fetchone()
+        return row[0] if row else None
+
+    def put(self, video_id, lang, is_generated, translated_from, segments):
+        """Store a transcript and return its content digest."""
+        digest, data = encode_segments(segments)
+        key = (video_id, lang, int(bool(is_generated)), translated_from or '')
+        with self._write_lock:
+            conn = self._connect()
+            try:
+                with conn:
+                    previous = conn.execute(
+                        "SELECT digest FROM transcripts "
+                        "WHERE video_id = ? AND lang = ? AND is_generated = ? AND translated_from = ?",
+                        key,
+                    ).fetchone()
+                    conn.execute(
+                        "INSERT OR IGNORE INTO blobs (digest, data, size) VALUES (?, ?, ?)",
+                        (digest, data, len(data)),
+                    )
+                    conn.execute(
+                        "INSERT OR REPLACE INTO transcripts "
+                        "(video_id, lang, is_generated, translated_from, digest, last_access) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (*key, digest, time.time()),
+                    )
+                    if previous and previous[0] != digest:
+                        self._release(conn, previous[0])
+                    # The database is the only total all processes sharing it agree on
+                    total = self._stored_bytes(conn)
+                    if total > self.max_bytes:
+                        self._write_touches(conn)
+                        self._evict(conn, total)
+            finally:
+                # Committed or rolled back, the size is whatever the database now holds
+                self._bytes = self._stored_bytes(conn)
+        return digest
+
+    def _touch(self, keys):
+        """Note reads in memory; write them out once touch_interval has passed."""
+        if not keys:
+            return
+        now = time.time()
+        with self._touch_lock:
+            for key in keys:
+                self._touches[key] = now
+            if time.monotonic() - self._touched_at < self.touch_interval:
+                return
+            self._touched_at = time.monotonic()
+        # Another thread holding the write lock will write the notes out, or the next interval will
+        if not self._write_lock.acquire(blocking=False):
+            return
+        try:
+            conn = self._connect()
+            with conn:
+                self._write_touches(conn)
+        finally:
+            self._write_lock.release()
+
+    def _write_touches(self, conn):
+        """Write the noted access times inside the caller's transaction (write lock held)."""
+        with self._touch_lock:
+            touches, self._touches = self._touches, {}
+        if touches:
+            conn.executemany(
+                "UPDATE transcripts SET last_access = MAX(last_access, ?) "
+                "WHERE video_id = ? AND lang = ? AND is_generated = ? AND translated_from = ?",
+                [(at, v, l, int(g), t or '') for (v, l, g, t), at in touches.items()],
+            )
+
+    def _evict(self, conn, total):
+        """Drop least recently used keys until the payload size fits max_bytes."""
+        target = self.max_bytes * 0.9
+        rows = conn.execute(
+            "SELECT video_id, lang, is_generated, translated_from, digest "
+            "FROM transcripts ORDER BY last_access"
+        ).fetchall()
+        for *key, digest in rows:
+            if total <= target:
+                break
+            conn.execute(
+                "DELETE FROM transcripts "
+                "WHERE video_id = ? AND lang = ? AND is_generated = ? AND translated_from = ?",
+                key,
+            )
+            total -= self._release(conn, digest)
+
+    def _release(self, conn, digest):
+        """Delete a payload once no key references it any more; returns the bytes freed."""
+        if conn.execute("SELECT 1 FROM transcripts WHERE digest = ? LIMIT 1", (digest,)).fetchone():
+            return 0
+        row = conn.execute("SELECT size FROM blobs WHERE digest = ?", (digest,)).fetchone()
+        if not row:
+            return 0
+        conn.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+        return row[0]
@@ -0,0 +1,199 @@
+"""Memo layer for model translations, with an in-memory LRU tier and an optional shared SQLite tier"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS translations (
+    key TEXT PRIMARY KEY,
+    translation TEXT NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS translations_last_access ON translations(last_access);
+"""
+
+
+def normalize_text(text):
+    """Canonical form of a source text: NFC, single spaces, no surrounding whitespace."""
+    return re.sub(r'\s+', ' ', unicodedata.normalize('NFC', text)).strip()
+
+
+def translation_key(text, src_lang, tgt_lang, model_id):
+    return (normalize_text(text), src_lang, tgt_lang, model_id)
+
+
+class TranslationCache:
+    """
+    Two-tier translation memo keyed by (normalized text, src, tgt, model id).
+
+    The memory tier is a per-process LRU. The optional disk tier is a SQLite
+    database in WAL mode, so several Gunicorn workers pointed at the same file
+    share every translation any of them has produced. Disk hits only note
+    their access time in memory; the notes are written in one transaction at
+    most every touch_interval seconds (and before a prune).
+    """
+
+    def __init__(self, max_entries=20000, path=None, max_disk_entries=1000000, touch_interval=30.0):
+        self.max_entries = max_entries
+        self.path = path
+        self.max_disk_entries = max_disk_entries
+        self.touch_interval = touch_interval
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._puts_since_prune = 0
+        self._touches = {}
+        self._touched_at = time.monotonic()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.path:
+            with self._connect() as conn:
+                conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _disk_key(key):
+        return hashlib.sha1('\x1f'.join(key).encode('utf-8')).hexdigest()
+
+    def get_many(self, keys):
+        """Return {key: translation} for the keys found in either tier."""
+        found = {}
+        missing = []
+        with self._lock:
+            for key in keys:
+                if key in found:
+                    continue
+                translation = self._memory.get(key)
+                if translation is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = translation
+                    self.memory_hits += 1
+                else:
+                    missing.append(key)
+
+        if missing and self.path:
+            disk_keys = {self._disk_key(key): key for key in dict.fromkeys(missing)}
+            conn = self._connect()
+            rows = []
+            items = list(disk_keys)
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(items), 500):
+                chunk = items[start:start + 500]
+                rows += conn.execute(
+                    f"SELECT key, translation FROM translations WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+            now = time.time()
+            with self._lock:
+                for disk_key, translation in rows:
+                    key = disk_keys[disk_key]
+                    found[key] = translation
+                    self._remember(key, translation)
+                    self._touches[disk_key] = now
+                    self.disk_hits += 1
+                flush = rows and time.monotonic() - self._touched_at >= self.touch_interval
+                if flush:
+                    self._touched_at = time.monotonic()
+            if flush:
+                self._write_touches(conn)
+
+        with self._lock:
+            self.misses += len(set(missing) - found.keys())
+        return found
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def put_many(self, items):
+        """Store {key: translation} in both tiers."""
+        with self._lock:
+            for key, translation in items.items():
+                self._remember(key, translation)
+
+        if self.path and items:
+            now = time.time()
+            conn = self._connect()
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO translations (key, translation, last_access) VALUES (?, ?, ?)",
+                    [(self._disk_key(key), translation, now) for key, translation in items.items()],
+                )
+            with self._lock:
+                self._puts_since_prune += len(items)
+                prune = self._puts_since_prune >= 1000
+                if prune:
+                    self._puts_since_prune = 0
+            if prune:
+                self._write_touches(conn)
+                self._prune_disk(conn)
+
+    def put(self, key, translation):
+        self.put_many({key: translation})
+
+    def stats(self):
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                'entries': len(self._memory),
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+    def _remember(self, key, translation):
+        self._memory[key] = translation
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _write_touches(self, conn):
+        """Write the noted disk-tier access times in one transaction."""
+        with self._lock:
+            touches, self._touches = self._touches, {}
+        if touches:
+            with conn:
+                conn.executemany(
+                    "UPDATE translations SET last_access = MAX(last_access, ?) WHERE key = ?",
+                    [(at, disk_key) for disk_key, at in touches.items()],
+                )
+
+    def _prune_disk(self, conn):
+        with conn:
+            conn.execute(
+                "DELETE FROM translations WHERE key IN ("
+                "SELECT key FROM translations ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_disk_entries,),
+            )
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def shared_translation_cache():
+    """Process-wide cache; set TRANSLATION_CACHE_PATH to share the disk tier between workers."""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = TranslationCache(
+                max_entries=int(os.environ.get('TRANSLATION_CACHE_MAX_ENTRIES', 20000)),
+                path=os.environ.get('TRANSLATION_CACHE_PATH') or None,
+            )
+        return _shared_cache
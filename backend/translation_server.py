@@ -0,0 +1,266 @@
+"""
+Local translation worker: loads SMaLL-100 once and serves every web worker over a local socket
+
+    python translation_server.py --address localhost:6100 --max-batch-size 32 --max-wait-ms 10
+
+Requests from all connections go through one MicroBatcher, which merges
+whatever arrives within max_wait into a single translate_batch call. Web
+workers point TRANSLATION_SERVER at the same address and get a
+TranslationClient with the same translate_batch interface as
+FastM2MTranslator.
+
+multiprocessing.connection unpickles whatever it receives, so server and
+clients must share a secret in TRANSLATION_SERVER_AUTHKEY (e.g. the output
+of `python -c "import secrets; print(secrets.token_hex(32))"`); the server
+refuses to start without one.
+"""
+import argparse
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing.connection import Client, Listener, answer_challenge, deliver_challenge
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ADDRESS = 'localhost:6100'
+HANDSHAKE_TIMEOUT = 5.0
+AUTHKEY_ENV = 'TRANSLATION_SERVER_AUTHKEY'
+
+
+def parse_address(value):
+    """'host:port' becomes a TCP address, anything else a Unix socket path."""
+    if ':' in value and not value.startswith('/'):
+        host, port = value.rsplit(':', 1)
+        return host, int(port)
+    return value
+
+
+def authkey_from_env(environ=os.environ):
+    """The shared secret of server and clients; raises RuntimeError when it is not set."""
+    authkey = environ.get(AUTHKEY_ENV, '')
+    if not authkey:
+        raise RuntimeError(f'{AUTHKEY_ENV} must be set to a shared secret to use the translation server')
+    return authkey.encode('utf-8')
+
+
+class _Request:
+    __slots__ = ('items', 'profile', 'future')
+
+    def __init__(self, items, profile):
+        self.items = items
+        self.profile = profile
+        self.future = Future()
+
+
+class MicroBatcher:
+    """
+    Merge concurrent translate_batch calls into full batches.
+
+    The batching thread takes the first waiting request, then keeps adding
+    requests until max_batch_size items are collected or max_wait seconds have
+    passed, and translates them in one call per translation profile. A
+    request is never split. If a merged batch fails, its requests are
+    translated again one by one, so an error (e.g. an unsupported language)
+    only reaches the request that caused it.
+    """
+
+    def __init__(self, translate_batch, max_batch_size=32, max_wait=0.01):
+        self.translate_batch = translate_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.requests = 0
+        threading.Thread(target=self._run, name='micro-batcher', daemon=True).start()
+
+    def submit(self, items, profile='caption'):
+        """Queue items for translation; returns a Future resolving to their translations in order."""
+        request = _Request(list(items), profile)
+        self._queue.put(request)
+        return request.future
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        count = len(batch[0].items)
+        deadline = time.monotonic() + self.max_wait
+        while count < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(request)
+            count += len(request.items)
+        return batch
+
+    def _run(self):
+        while True:
+            by_profile = {}
+            for request in self._collect():
+                by_profile.setdefault(request.profile, []).append(request)
+            for profile, batch in by_profile.items():
+                self._translate(batch, profile)
+
+    def _translate(self, batch, profile):
+        items = [item for request in batch for item in request.items]
+        try:
+            results = self.translate_batch(items, batch_size=self.max_batch_size, profile=profile)
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0].future.set_exception(e)
+            else:
+                for request in batch:
+                    self._translate([request], profile)
+            return
+
+        position = 0
+        for request in batch:
+            request.future.set_result(results[position:position + len(request.items)])
+            position += len(request.items)
+        with self._lock:
+            self.batches += 1
+            self.items += len(items)
+            self.requests += len(batch)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'batches': self.batches,
+                'items': self.items,
+                'requests': self.requests,
+                'pending': self._queue.qsize(),
+                'average_batch_items': self.items / self.batches if self.batches else 0.0,
+            }
+
+
+def _shutdown(conn):
+    """Wake a thread blocked reading conn; the connection fails from then on."""
+    try:
+        with socket.socket(fileno=os.dup(conn.fileno())) as sock:
+            sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+
+def _handle_connection(conn, batcher, authkey, handshake_timeout=HANDSHAKE_TIMEOUT):
+    with conn:
+        # The authkey handshake runs here, not in accept(), so a stalled client only holds up itself
+        timer = threading.Timer(handshake_timeout, _shutdown, args=(conn,))
+        timer.start()
+        try:
+            deliver_challenge(conn, authkey)
+            answer_challenge(conn, authkey)
+        except Exception as e:
+            logger.warning("translation_server.rejected_client error=%r", str(e))
+            return
+        finally:
+            timer.cancel()
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                return
+            try:
+                if message.get('op') == 'translate':
+                    result = batcher.submit(message['items'], message.get('profile', 'caption')).result()
+                elif message.get('op') == 'stats':
+                    result = batcher.stats()
+                else:
+                    raise ValueError(f"Unknown operation: {message.get('op')}")
+                conn.send({'ok': True, 'result': result})
+            except Exception as e:
+                conn.send({'ok': False, 'error': str(e)})
+
+
+def serve(translator, address, authkey, max_batch_size=32, max_wait=0.01):
+    """Accept connections forever, one thread per connection, all sharing one batcher."""
+    batcher = MicroBatcher(translator.translate_batch, max_batch_size, max_wait)
+    with Listener(address, backlog=128) as listener:
+        logger.info("translation_server.listening address=%s", listener.address)
+        while True:
+            try:
+                conn = listener.accept()
+            except OSError as e:
+                logger.warning("translation_server.accept_failed error=%r", str(e))
+                continue
+            threading.Thread(target=_handle_connection, args=(conn, batcher, authkey), daemon=True).start()
+
+
+class TranslationClient:
+    """Drop-in replacement for FastM2MTranslator that forwards to a translation server."""
+
+    def __init__(self, address, authkey):
+        self.address = address
+        self.authkey = authkey
+        self._local = threading.local()
+
+    def _request(self, message):
+        # Connections are not thread-safe, so every thread has its own; reconnect once if it dropped
+        for attempt in range(2):
+            conn = getattr(self._local, 'conn', None)
+            try:
+                if conn is None:
+                    conn = self._local.conn = Client(self.address, authkey=self.authkey)
+                conn.send(message)
+                response = conn.recv()
+                break
+            except (EOFError, OSError):
+                self._local.conn = None
+                if attempt:
+                    raise
+        if not response['ok']:
+            raise RuntimeError(f"Translation server error: {response['error']}")
+        return response['result']
+
+    def translate_batch(self, items, batch_size=32, profile='caption'):
+        """Translate a list of (text, src_lang, tgt_lang) items, returning results in input order."""
+        items = [tuple(item) for item in items]
+        if not items:
+            return []
+        return self._request({'op': 'translate', 'items': items, 'profile': profile})
+
+    def translate_keyword(self, text, src_lang, tgt_lang):
+        return self.translate_batch([(text, src_lang, tgt_lang)], profile='keyword')[0]
+
+    def warmup(self):
+        """Check that the server answers; the model itself is warmed up by the server."""
+        self.stats()
+
+    def stats(self):
+        return self._request({'op': 'stats'})
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve SMaLL-100 translations to local web workers')
+    parser.add_argument('--address', default=os.environ.get('TRANSLATION_SERVER', DEFAULT_ADDRESS),
+                        help='host:port or Unix socket path')
+    parser.add_argument('--max-batch-size', type=int, default=32)
+    parser.add_argument('--max-wait-ms', type=float, default=10.0)
+    parser.add_argument('--quantize', action='store_true', help='dynamic int8 quantization (CPU)')
+    parser.add_argument('--threads', type=int, default=None)
+    parser.add_argument('--interop-threads', type=int, default=None)
+    args = parser.parse_args()
+    try:
+        authkey = authkey_from_env()
+    except RuntimeError as e:
+        parser.error(str(e))
+    logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO').upper(),
+                        format='%(asctime)s %(levelname)s %(name)s %(message)s')
+
+    from test_highlighting import FastM2MTranslator
+    translator = FastM2MTranslator(quantize=args.quantize, num_threads=args.threads,
+                                   interop_threads=args.interop_threads)
+    translator.warmup()
+    serve(translator, parse_address(args.address), authkey, args.max_batch_size, args.max_wait_ms / 1000)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""The process-wide keyword translator: created once, on first use or by a background warmup"""
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def translator_from_env(environ=os.environ):
+    """A translation server client if TRANSLATION_SERVER is set, otherwise the local SMaLL-100 model."""
+    if environ.get('TRANSLATION_SERVER'):
+        # Share one model across all web workers through translation_server.py
+        from translation_server import TranslationClient, authkey_from_env, parse_address
+        return TranslationClient(parse_address(environ['TRANSLATION_SERVER']), authkey_from_env(environ))
+    from test_highlighting import FastM2MTranslator
+    # TRANSLATOR_QUANTIZE=int8 and TORCH_NUM_THREADS/TORCH_INTEROP_THREADS tune CPU inference
+    return FastM2MTranslator(
+        quantize=environ.get('TRANSLATOR_QUANTIZE', '').lower() == 'int8',
+        num_threads=int(environ.get('TORCH_NUM_THREADS', 0)) or None,
+        interop_threads=int(environ.get('TORCH_INTEROP_THREADS', 0)) or None,
+    )
+
+
+class TranslatorRegistry:
+    """
+    Holds the single translator of this process.
+
+    get() creates it on first use; warmup() does the same in a background
+    thread and runs one dummy translation, so the first highlight request
+    finds a loaded, initialized model. Callers arriving while it loads wait
+    for that load instead of starting another. A failed load is reported by
+    status() and retried on the next get().
+    """
+
+    def __init__(self, factory=translator_from_env):
+        self.factory = factory
+        self._translator = None
+        self._lock = threading.Lock()
+        self._state = 'idle'
+        self._error = None
+        self._load_seconds = None
+
+    def get(self):
+        translator = self._translator
+        if translator is not None:
+            return translator
+        with self._lock:
+            if self._translator is None:
+                self._load()
+            return self._translator
+
+    def _load(self):
+        self._state = 'loading'
+        started = time.perf_counter()
+        try:
+            translator = self.factory()
+            warmup = getattr(translator, 'warmup', None)
+            if warmup is not None:
+                warmup()
+        except Exception as e:
+            self._state = 'failed'
+            self._error = str(e)
+            raise
+        self._load_seconds = time.perf_counter() - started
+        self._error = None
+        self._state = 'ready'
+        self._translator = translator
+        logger.info("translator.ready type=%s seconds=%.2f", type(translator).__name__, self._load_seconds)
+
+    def warmup(self):
+        """Load and warm the translator in a daemon thread; returns immediately."""
+        def run():
+            try:
+                self.get()
+            except Exception:
+                logger.exception("translator.warmup_failed")
+
+        threading.Thread(target=run, name='translator-warmup', daemon=True).start()
+
+    def ready(self):
+        return self._translator is not None
+
+    def status(self):
+        return {
+            'state': self._state,
+            'error': self._error,
+            'load_seconds': self._load_seconds,
+        }
+
+
+translator_registry = TranslatorRegistry()
@@ -0,0 +1,129 @@
+"""Shared limiter for calls to the transcript upstream: bounded concurrency, per-host rate limits, backpressure"""
+import os
+import threading
+import time
+
+DEFAULT_HOST = 'www.youtube.com'
+
+
+class UpstreamBusy(Exception):
+    """Raised instead of queueing when the upstream pool is saturated."""
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, at most `burst` banked."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout):
+        """Take one token, waiting up to timeout seconds; return False on timeout."""
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class UpstreamLimiter:
+    """
+    Gate for every upstream call, shared by the threaded and the asyncio server.
+
+    At most max_concurrency calls run at once and at most max_pending callers may
+    be waiting for a slot; anyone beyond that, or anyone who cannot get a slot or
+    a rate-limit token within acquire_timeout, gets UpstreamBusy right away
+    instead of piling up more threads.
+    """
+
+    def __init__(self, max_concurrency=8, max_pending=64, rate_per_host=10.0, burst=20, acquire_timeout=10.0):
+        self.max_concurrency = max_concurrency
+        self.max_pending = max_pending
+        self.rate_per_host = rate_per_host
+        self.burst = burst
+        self.acquire_timeout = acquire_timeout
+
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._active = 0
+
+        self.calls = 0
+        self.rejected = 0
+
+    def _bucket(self, host):
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = self._buckets[host] = TokenBucket(self.rate_per_host, self.burst)
+            return bucket
+
+    def _reject(self, message):
+        with self._lock:
+            self.rejected += 1
+        raise UpstreamBusy(message)
+
+    def call(self, fn, *args, host=DEFAULT_HOST, **kwargs):
+        """Run fn(*args, **kwargs) in the calling thread once a slot and a rate-limit token are available."""
+        with self._lock:
+            if self._waiting >= self.max_pending:
+                self.rejected += 1
+                raise UpstreamBusy('Too many requests waiting for the transcript service')
+            self._waiting += 1
+        try:
+            acquired = self._slots.acquire(timeout=self.acquire_timeout)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+        if not acquired:
+            self._reject('Timed out waiting for the transcript service')
+
+        try:
+            if not self._bucket(host).acquire(self.acquire_timeout):
+                self._reject(f'Rate limit for {host} exceeded')
+            with self._lock:
+                self._active += 1
+                self.calls += 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._active -= 1
+        finally:
+            self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'active': self._active,
+                'waiting': self._waiting,
+                'calls': self.calls,
+                'rejected': self.rejected,
+                'max_concurrency': self.max_concurrency,
+                'max_pending': self.max_pending,
+            }
+
+
+upstream = UpstreamLimiter(
+    max_concurrency=int(os.environ.get('UPSTREAM_MAX_CONCURRENCY', 8)),
+    max_pending=int(os.environ.get('UPSTREAM_MAX_PENDING', 64)),
+    rate_per_host=float(os.environ.get('UPSTREAM_RATE_PER_HOST', 10)),
+    burst=int(os.environ.get('UPSTREAM_BURST', 20)),
+    acquire_timeout=float(os.environ.get('UPSTREAM_ACQUIRE_TIMEOUT', 10)),
+)
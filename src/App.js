@@ -3,7 +3,7 @@ import './App.css';
 
 // Update this component (around line 5-89 in your code)
 // Fixed StyledCaptionText component
-const StyledCaptionText = ({ text, customization, darkMode, getColor }) => {
+const StyledCaptionText = ({ text, parts, customization, darkMode, getColor }) => {
   // Font styles from customization
   const fontStyles = {
     fontFamily: getFontFamily(customization.fontFamily),
@@ -57,13 +57,9 @@ const StyledCaptionText = ({ text, customization, darkMode, getColor }) => {
     return segments;
   };
   
-  // Parse text into segments
-  const segments = processText(text);
-  
-  // Main render function - completely pure React approach
-  return (
-    <span style={fontStyles}>
-      {segments.map((segment, index) => {
+  // Render parsed segments - completely pure React approach
+  const renderSegments = (segments) => (
+      segments.map((segment, index) => {
         if (segment.type === 'text') {
           return <span key={index}>{segment.content}</span>;
         } else if (segment.type === 'noun') {
@@ -104,7 +100,25 @@ const StyledCaptionText = ({ text, customization, darkMode, getColor }) => {
           );
         }
         return null;
-      })}
+      })
+  );
+
+  // Keyword highlights: pieces of the caption, each tagged separately, some wrapped in a highlight
+  if (parts) {
+    return (
+      <span style={fontStyles}>
+        {parts.map((part, index) => (
+          part.highlighted
+            ? <span key={index} className="highlighted-keyword">{renderSegments(processText(part.text))}</span>
+            : <React.Fragment key={index}>{renderSegments(processText(part.text))}</React.Fragment>
+        ))}
+      </span>
+    );
+  }
+
+  return (
+    <span style={fontStyles}>
+      {renderSegments(processText(text))}
     </span>
   );
 };
@@ -179,6 +193,7 @@ function App() {
 
   // for hightlight
   const [highlightingEnabled, setHighlightingEnabled] = useState(true);
+  const [keywordHighlights, setKeywordHighlights] = useState({});
 
   // New state for managing language customization collapse
   const [collapsedLanguages, setCollapsedLanguages] = useState({});
@@ -292,45 +307,65 @@ function App() {
     }));
   };
 
-  // highlighting api
-  const HIGHLIGHTER_API_URL = './Grammar-Highlighter/highlight'; // Grammar Highlighter API URL
-  
-   // Call Grammar Highlighter API
-   const extractKeywords = async (text) => {
+  // Fetch keyword highlights for the whole video in one request; signal aborts it once the video or languages change
+  const fetchHighlights = async (videoId, sourceLang, targetLangs, signal) => {
     try {
-      const response = await fetch(HIGHLIGHTER_API_URL, {
+      const response = await fetch(`${API_BASE_URL}/api/highlight`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ text }),
+        body: JSON.stringify({ videoId, sourceLang, targetLangs }),
+        signal,
       });
 
-      if (!response.ok) throw new Error(`Failed to extract keywords: ${response.status}`);
+      if (!response.ok) throw new Error(`Failed to fetch highlights: ${response.status}`);
 
       const data = await response.json();
-      return data.keywords || [];
+
+      // Index match spans by language and caption index
+      const spansByLang = { [sourceLang]: {} };
+      data.segments.forEach(segment => {
+        spansByLang[sourceLang][segment.index] = segment.spans;
+        Object.entries(segment.translations).forEach(([lang, match]) => {
+          spansByLang[lang] = spansByLang[lang] || {};
+          spansByLang[lang][match.index] = match.spans;
+        });
+      });
+      if (signal.aborted) return;
+      setKeywordHighlights(spansByLang);
     } catch (error) {
-      console.error('Error extracting keywords:', error);
-      return [];
+      // A newer request replaced this one; its result will be shown instead
+      if (signal.aborted) return;
+      console.error('Error fetching highlights:', error);
+      setKeywordHighlights({});
     }
   };
 
-  // Highlight keywords in captions
-  const highlightKeywords = async (text) => {
-    if (!highlightingEnabled || !text) return text;
-
-    const keywords = await extractKeywords(text);
-    if (keywords.length === 0) return text;
-
-    const regex = new RegExp(`\\b(${keywords.join('|')})\\b`, 'gi');
-    return text.split(regex).map((part, index) =>
-      keywords.includes(part) ? (
-        <span key={index} className="highlighted-keyword">
-          {part}
-        </span>
-      ) : (
-        part
-      )
-    );
+  useEffect(() => {
+    if (!highlightingEnabled || !videoId || !selectedLanguages.primary) return;
+    const targetLangs = selectedLanguages.secondary ? [selectedLanguages.secondary] : [];
+    const controller = new AbortController();
+    fetchHighlights(videoId, selectedLanguages.primary, targetLangs, controller.signal);
+    return () => controller.abort();
+  }, [videoId, selectedLanguages.primary, selectedLanguages.secondary, highlightingEnabled]);
+
+  // Split a caption's original text at the keyword spans fetched for the whole video;
+  // null when there is nothing to highlight. Spans index the untagged text, so this runs before POS tagging.
+  const highlightKeywords = (caption, lang) => {
+    const spans = keywordHighlights[lang]?.[caption.index];
+    if (!highlightingEnabled || !caption.rawText || !spans || spans.length === 0) return null;
+
+    // Spans are code point offsets, sorted and non-overlapping, so slice on code points rather than UTF-16 units
+    const chars = Array.from(caption.rawText);
+    const parts = [];
+    let cursor = 0;
+    spans.forEach(([start, end]) => {
+      if (start < cursor) return;
+      parts.push({ text: chars.slice(cursor, start).join(''), highlighted: false });
+      parts.push({ text: chars.slice(start, end).join(''), highlighted: true });
+      cursor = end;
+    });
+    parts.push({ text: chars.slice(cursor).join(''), highlighted: false });
+    return parts.filter(part => part.text);
   };
 
   // Initialize with the default URL and load Iconify script
@@ -612,8 +647,8 @@ function App() {
       
       setStatusWithTimeout(`Found captions in ${languageCodes.length} languages. Fetching transcripts...`);
       
-      // Fetch transcripts for all available languages
-      await fetchCaptions(videoId, languageCodes);
+      // Fetch transcripts for all available languages, primary first so it renders right away
+      await fetchCaptions(videoId, [defaultPrimary, ...languageCodes.filter(code => code !== defaultPrimary)].filter(Boolean));
       
     } catch (error) {
       console.error('Error fetching transcript languages:', error);
@@ -629,52 +664,68 @@ function App() {
       setLoadingProgress(0);
       setShowLoadingProgress(true);
       
-      // Create an array of promises for parallel fetching
-      const fetchPromises = languages.map(async (lang) => {
-        try {
-          const response = await fetch(`${API_BASE_URL}/api/get-transcript?videoId=${videoId}&lang=${lang}`);
-          
-          if (!response.ok) {
-            console.warn(`Failed to fetch transcript for ${lang}: ${response.status}`);
-            return { lang, error: true };
-          }
-          
-          const data = await response.json();
-          
-          if (data.error) {
-            console.warn(`Error fetching transcript for ${lang}: ${data.error}`);
-            return { lang, error: true };
-          }
-          
+      // Stream the transcripts: each language is rendered as soon as the server sends it
+      const response = await fetch(`${API_BASE_URL}/api/stream-transcripts`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ videoId, languages }),
+      });
+
+      if (!response.ok) {
+        const data = await response.json().catch(() => ({}));
+        throw new Error(data.error || `Failed to fetch transcripts: ${response.status}`);
+      }
+
+      let successfulLoads = 0;
+
+      const handleMessage = (message) => {
+        if (message.done) {
+          return;
+        }
+
+        if (message.error) {
+          console.warn(`Error fetching transcript for ${message.lang}: ${message.error}`);
+        } else {
           // Process the transcript data - add POS tagging
-          const processedTranscript = data.transcript.map(caption => ({
+          // rawText and index let keyword spans from /api/highlight be applied to the original text
+          const processedTranscript = message.transcript.map((caption, index) => ({
             ...caption,
+            index,
+            rawText: caption.text,
             text: applyPOSTagging(caption.text),
             end: caption.start + caption.duration // Calculate end time
           }));
-          
+
           // Update captions immediately as each one loads
           setCaptions(prev => ({
             ...prev,
-            [lang]: processedTranscript
+            [message.lang]: processedTranscript
           }));
+          successfulLoads += 1;
+        }
 
-          // Update loading progress
-          setLoadingProgress(prev => prev + (100 / languages.length));
-          
-          return { lang, transcript: processedTranscript };
-        } catch (error) {
-          console.warn(`Error processing transcript for ${lang}:`, error);
-          return { lang, error: true };
+        // Update loading progress
+        setLoadingProgress(prev => prev + (100 / languages.length));
+      };
+
+      // Newline-delimited JSON: split on newlines, keep the trailing partial line for the next chunk
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      while (true) {
+        const { done, value } = await reader.read();
+        buffer += decoder.decode(value || new Uint8Array(), { stream: !done });
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
+        lines.filter(line => line.trim()).forEach(line => handleMessage(JSON.parse(line)));
+        if (done) {
+          if (buffer.trim()) {
+            handleMessage(JSON.parse(buffer));
+          }
+          break;
         }
-      });
-      
-      // Wait for all transcripts to load in parallel
-      const results = await Promise.all(fetchPromises);
-      
-      // Count successful loads
-      const successfulLoads = results.filter(result => !result.error).length;
-      
+      }
+
       // Update final status with timeout
       setStatusWithTimeout(`Successfully loaded captions in ${successfulLoads} languages`, 2000);
       setLoadingProgress(100);
@@ -800,8 +851,8 @@ function App() {
   };
 
   // Format caption text using new StyledCaptionText component
-  const formatCaptionText = (text, lang) => {
-    if (!text) return '';
+  const formatCaptionText = (caption, lang) => {
+    if (!caption || !caption.text) return '';
     
     const customization = languageCustomizations[lang] || {
       fontFamily: 'Arial / Helvetica',
@@ -820,9 +871,13 @@ function App() {
       letterSpacing: customization.letterSpacing || 0
     };
     
+    // Keyword highlights split the original text; each piece is POS-tagged on its own
+    const parts = highlightKeywords(caption, lang);
+
     return (
       <StyledCaptionText 
-        text={text} 
+        text={caption.text} 
+        parts={parts && parts.map(part => ({ ...part, text: applyPOSTagging(part.text) }))} 
         customization={fullCustomization} 
         darkMode={darkMode}
         getColor={getColor}
@@ -1418,7 +1473,7 @@ function App() {
                           userSelect: 'none' // Prevent text selection while dragging
                         }}
                       >
-                        {formatCaptionText(activeCaptions[lang].text, lang)}
+                        {formatCaptionText(activeCaptions[lang], lang)}
                       </div>
                     )
                   ))}
@@ -1454,7 +1509,7 @@ function App() {
                       <div className="caption-content-wrapper">
                         {activeCaptions[lang] ? (
                           <div className="caption-text">
-                            {formatCaptionText(activeCaptions[lang].text, lang)}
+                            {formatCaptionText(activeCaptions[lang], lang)}
                           </div>
                         ) : (
                           <span className="no-caption">   ...</span>
@@ -1522,7 +1577,7 @@ function App() {
                               {Math.floor(caption.end / 60)}:{(caption.end % 60).toFixed(1).padStart(4, '0')}
                             </div>
                             <div className="caption-text">
-                              {formatCaptionText(caption.text, lang)}
+                              {formatCaptionText(caption, lang)}
                             </div>
                           </div>
                         ))}